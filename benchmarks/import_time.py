@@ -0,0 +1,72 @@
+#### import_time.py
+#
+# Benchmark of `import logiq`: it measures (in fresh interpreters) the time spent to import logiq
+# and checks that nothing is created or imported before it's used.
+# It fails (exit code 1) if the import is slower than the limit or if something is done eagerly:
+#
+#   python benchmarks/import_time.py [--runs N] [--max-ms MS]
+#
+####
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# what `import logiq` (and then `import logiq.creations`) must not do (the objects are created when they are used for the first time)
+CHECK = '''
+import sys
+from logiq.src import Basis, Operator
+
+def check(imported, modules):
+    lazy = {
+        'the bases': [b for b in ('stdbasis', 'hadamard', 'bell') if b in vars(Basis)],
+        'the operators': [k for k in Operator._OPS if not isinstance(vars(Operator.Op)[k], Operator._lazyOp)],
+        'the modules': [m for m in modules if m in sys.modules],
+    }
+    for what, eager in lazy.items():
+        if eager: print(what + ' created at ' + imported + ': ' + ', '.join(eager))
+
+modules = ['logiq.src.Circuit', 'logiq.src.parallel', 'logiq.src.QbitPool', 'logiq.src.StateBatch', 'numpy.random', 'concurrent.futures']
+import logiq
+check('import logiq', modules + ['logiq.creations'])
+import logiq.creations
+check('import logiq.creations', modules)
+'''
+
+
+def import_time():
+    # the time (in ms) spent to import logiq, excluding numpy, from the output of `-X importtime`
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import logiq'],
+                         cwd=ROOT, capture_output=True, text=True, check=True).stderr
+    times = {}
+    for line in out.splitlines():
+        if not line.startswith('import time:') or '|' not in line: continue
+        _, cumulative, name = line.split('|')
+        if name.strip() in ('logiq', 'numpy') and cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative) / 1000
+    return times['logiq'] - times.get('numpy', 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of `import logiq`')
+    parser.add_argument('--runs', type=int, default=10, help='the number of fresh interpreters used (default 10)')
+    parser.add_argument('--max-ms', type=float, default=75, help='the maximum time (median, numpy excluded) allowed (default 75 ms)')
+    args = parser.parse_args()
+
+    errors = subprocess.run([sys.executable, '-c', CHECK], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+
+    times = [import_time() for _ in range(args.runs)]
+    median = statistics.median(times)
+    print('import logiq (numpy excluded): median %.1f ms, min %.1f ms, max %.1f ms (%d runs)' % (median, min(times), max(times), args.runs))
+
+    if errors: print(errors, end='')
+    if median > args.max_ms: print('too slow: the limit is %.1f ms' % args.max_ms)
+    return 1 if errors or median > args.max_ms else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,34 @@
 from .src.abs_Qstate import auto_norm, cheat
-from .src.Basis import Basis, CanonBasis, bell, hadamard, stdbasis
+from .src.Basis import Basis, CanonBasis
 from .src.Operator import Op
 from .src.Qmath import bra, ket, kron, matrix, nkron, roundedVector, vector
 from .src.Qstate import Qstate, qbit
-from .src.qtils import equal, equals, isScalar, set_n_digits, set_precision, what_precision
+from .src.qtils import (equal, equals, isScalar, set_backend, set_cache_size, set_n_digits, set_precision, set_rng, set_rounding, set_validation,
+                        what_backend, what_cache_size, what_mps, what_precision, what_rng, what_rounding, what_validation)
+
+
+# these objects (and their modules) are imported only the first time they are used, to keep `import logiq` fast
+_LAZY = {
+    'bell': '.src.Basis', 'hadamard': '.src.Basis', 'stdbasis': '.src.Basis',
+    'Circuit': '.src.Circuit',
+    'run_many': '.src.parallel',
+    'QbitPool': '.src.QbitPool',
+    'StateBatch': '.src.StateBatch',
+}
+
+__all__ = ['auto_norm', 'cheat', 'Basis', 'CanonBasis', 'Op', 'bra', 'ket', 'kron', 'matrix', 'nkron', 'roundedVector', 'vector',
+           'Qstate', 'qbit', 'equal', 'equals', 'isScalar', 'set_backend', 'set_cache_size', 'set_n_digits', 'set_precision', 'set_rng',
+           'set_rounding', 'set_validation', 'what_backend', 'what_cache_size', 'what_mps', 'what_precision', 'what_rng', 'what_rounding',
+           'what_validation'] + list(_LAZY)
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        from importlib import import_module
+        obj = globals()[name] = getattr(import_module(_LAZY[name], __name__), name)
+        return obj
+    raise AttributeError("module '"+__name__+"' has no attribute '"+name+"'")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
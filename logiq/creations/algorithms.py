@@ -1,5 +1,5 @@
 import math
-from logiq import *
+from logiq import Basis, CanonBasis, Op, ket, matrix, qbit
 
 
 def deutch(f):
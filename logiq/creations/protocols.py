@@ -1,18 +1,27 @@
 import math
-from logiq import *
+from logiq import Basis, Op, qbit
 
 
 rd=1/math.sqrt(2)
 
+class _sdcBasis:
+    # the basis of sdc, created only the first time it's used (then it takes the place of this object)
+
+    def __get__(self, obj, cls):
+        sdc.basis = Basis([
+                [rd,0,0,rd],
+                [0,rd*1j, rd*1j, 0],
+                [0, rd*1j, -rd*1j, 0],
+                [rd,0,0,-rd]
+            ], '0231')
+        return sdc.basis
+
+
+
 class sdc:
     #SuperDense Coding
 
-    basis = Basis([
-            [rd,0,0,rd],
-            [0,rd*1j, rd*1j, 0],
-            [0, rd*1j, -rd*1j, 0],
-            [rd,0,0,-rd]
-        ], '0231')
+    basis = _sdcBasis()
 
 
     def __init__(self, qbits):
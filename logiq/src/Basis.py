@@ -1,6 +1,6 @@
 from .Qerrors import InitializationError, NotAllowError
-from .Qmath import kron, math, matrix, np, roundedVector, vector
-from .qtils import STD_SYMBOLS
+from .Qmath import _content_hash, _frozen, math, matrix, np, roundedVector, vector
+from .qtils import STD_SYMBOLS, Vdigit, memo, prod, what_validation
 
 
 #### Basis.py
@@ -23,34 +23,48 @@ class Basis(matrix):
     + `symbols` (optional): the symbols to represent the autosate of this new basis
     """
 
-    def __init__(self, basis, symbols = None, no_cpy = False):
+    __slots__ = ('symbols', '_ew', '_hash', '_key')
+
+    def __init__(self, basis, symbols = None, no_cpy = False, _trusted = False):
         try:
             if isinstance(basis, Basis):
                 super().__init__(basis, no_cpy=True)
                 self.symbols = basis.symbols
-                self.ew = basis.ew
+                self._ew = basis._ew
                 return
 
             super().__init__(basis, no_cpy=no_cpy)
 
-            if (not self.isOrthonormal()):
+            if not _trusted and what_validation() and not self.isOrthonormal():
                 raise ValueError("The vectors of the basis must be 'orthonormal' with each other")
             
-            self.ew = tuple(np.linalg.eig(self.mtx)[0])
+            self._ew = None
 
-            if symbols != None:
-                self.symbols = symbols
-                if len(symbols) != len(self):
-                    raise ValueError('Length of symbols and basis must be the same')
-            elif len(self) <= len(STD_SYMBOLS):
-                self.symbols = STD_SYMBOLS[:len(self)]
-            else:
-                self.symbols = dynSymb(len(self))
+            self._setSymbols(symbols)
 
         except Exception as e:
             raise InitializationError('Error to initialize Basis', e)
     
 
+    def _setSymbols(self, symbols):
+        if symbols != None:
+            self.symbols = symbols
+            if len(symbols) != len(self):
+                raise ValueError('Length of symbols and basis must be the same')
+        elif len(self) <= len(STD_SYMBOLS):
+            self.symbols = STD_SYMBOLS[:len(self)]
+        else:
+            self.symbols = dynSymb(len(self))
+
+
+    @property
+    def ew(self):
+        "The eigenvalues of this basis (computed the first time they are needed)"
+        if self._ew is None:
+            self._ew = memo.get(('ew', self._memoKey()), lambda: tuple(np.linalg.eig(self.mtx)[0]))
+        return self._ew
+
+
     def eigenstate(self, i):
         "returns the i-th eigenstate"       
         if isinstance(i, slice):
@@ -73,7 +87,7 @@ class Basis(matrix):
 
         (i.e. apply the matrix that describe this basis to `vect`)
         """
-        return roundedVector(self.mtx*vect if vect.isCol() else vect*self.T)
+        return roundedVector(self.mtx @ vect._a if vect.isCol() else vect._a @ self.mtx)
 
 
     def __or__(self, q):
@@ -86,12 +100,25 @@ class Basis(matrix):
 
     def __matmul__(self, other):
         if isinstance(other, Basis):
-            return Basis(kron(self, other), no_cpy=True)
+            pieces = lambda b: b._pieces if isinstance(b, KronBasis) else [b]
+            return KronBasis(pieces(self) + pieces(other))
         return super().__matmul__(other)
 
     
     def __invert__(self):
          return self
+
+
+    def __hash__(self):
+        # the content hash (see Qmath) is computed only once, because a basis is immutable
+        if getattr(self, '_hash', None) is None: self._hash = _content_hash(self.mtx)
+        return self._hash
+
+
+    def _memoKey(self):
+        # the key of the values cached from this basis: the exact content hash (see Op._memoKey)
+        if getattr(self, '_key', None) is None: self._key = _content_hash(self.mtx, exact=True)
+        return self._key
     
 
     def conj(self):
@@ -105,7 +132,6 @@ class Basis(matrix):
     def __getattr__(self, name):
         if name in 'tT': return self
         elif name in 'hH': return self
-        elif name == 'shape': return self.mtx.shape
         raise AttributeError("'Basis' object has no attribute '"+name+"'")
 
     
@@ -124,7 +150,7 @@ class Basis(matrix):
     @staticmethod
     def random(dim, symbols=None):
         "Return a random basis"
-        return Basis(matrix.rand_orthonormal(dim), symbols=symbols, no_cpy=True)
+        return Basis(matrix.rand_orthonormal(dim), symbols=symbols, no_cpy=True, _trusted=True)
 
 
 
@@ -136,11 +162,13 @@ class CanonBasis(Basis):
     + `symbols` (optional): the symbols to represent the autosates of this new basis
     """
 
+    __slots__ = ()
+
     def __init__(self, dim, symbols = None):
         if dim < 2:
             raise ValueError('Minimum length allow for a Basis is 2')
 
-        super().__init__(np.identity(dim), symbols, no_cpy=True)
+        super().__init__(np.identity(dim), symbols, no_cpy=True, _trusted=True)
     
     
     def transform(self, vect: vector):
@@ -148,6 +176,78 @@ class CanonBasis(Basis):
 
 
 
+class KronBasis(Basis):
+    """
+    The Kronecker product of some bases (i.e. `b1 @ b2 @ ...`), it's kept factored:  
+    the complete matrix is built only when it's needed
+
+    + `pieces`: the list of bases
+    + `symbols` (optional): the symbols to represent the autosates of this new basis
+    """
+
+    __slots__ = ('_pieces',)
+
+    def __init__(self, pieces, symbols = None):
+        try:
+            self._pieces = list(pieces)
+            self._mtx = None
+            self._ew = None
+            self._setSymbols(symbols)
+
+        except Exception as e:
+            raise InitializationError('Error to initialize Basis', e)
+
+
+    def _dense(self):
+        # (the complete matrix is shared, through the cache, by all the products of the same bases)
+        def expand():
+            M = self._pieces[0].mtx
+            for b in self._pieces[1:]:
+                M = np.kron(M, b.mtx)
+            return _frozen(M)
+        return memo.get(('kron',) + tuple(b._memoKey() for b in self._pieces), expand)
+
+
+    @property
+    def shape(self):
+        n = prod((len(b) for b in self._pieces))
+        return (n, n)
+
+
+    @property
+    def ew(self):
+        # the eigenvalues of a Kronecker product are the products of the eigenvalues of the pieces
+        if self._ew is None:
+            ew = np.ones(1, complex)
+            for b in self._pieces:
+                ew = np.kron(ew, b.ew)
+            self._ew = tuple(ew)
+        return self._ew
+
+
+    def transform(self, vect):
+        if not vect.isCol(): return super().transform(vect)
+
+        # every basis is applied only to its own qudit (the canonical ones are skipped)
+        psi = vect._a.reshape([len(b) for b in self._pieces])
+        for i, b in enumerate(self._pieces):
+            if not isinstance(b, CanonBasis): psi = b._contract(psi, [i])
+        return roundedVector(vector(psi.reshape(vect.shape), no_cpy=True))
+
+
+    def eigenstate(self, i):
+        if isinstance(i, slice):
+            return super().eigenstate(i)
+        
+        # the i-th eigenstate is the Kronecker product of the eigenstates of the pieces
+        ds = Vdigit([len(b) for b in self._pieces], i % len(self)).ds
+        out = self._pieces[0][ds[0]]
+        for b, d in zip(self._pieces[1:], ds[1:]):
+            out = out @ b[d]
+        return out
+
+
+
 class dynSymb:
     # simple class to provide illimitate symbols for big bases, without allocate useless memory
 
@@ -173,21 +273,31 @@ class dynSymb:
 
 
 # ↓↓↓↓↓↓↓↓↓↓↓↓ Creation of most used bases ↓↓↓↓↓↓↓↓↓↓↓↓ #
+# (every basis is created only the first time it's used, e.g. by `from .Basis import hadamard`)
 
 rd = 1/math.sqrt(2) #reciprocal diagonal ;)
 
-stdbasis = CanonBasis(2)
+_BASES = {
+    'stdbasis': lambda: CanonBasis(2),
+
+    'hadamard': lambda: Basis(
+        ((rd,rd),
+        (rd,-rd)),
+        '+-'),
+
+    'bell': lambda: Basis(
+        ((rd,0,0,rd),
+        (0,rd,rd,0),
+        (0,rd,-rd,0),
+        (rd,0,0,-rd)),
+        ['Φ+','Ψ+','Ψ-','Φ-']),
+}
 
-hadamard = Basis(
-    ((rd,rd),
-    (rd,-rd)),
-    '+-')
 
-bell = Basis(
-    ((rd,0,0,rd),
-    (0,rd,rd,0),
-    (0,rd,-rd,0),
-    (rd,0,0,-rd)),
-    ['Φ+','Ψ+','Ψ-','Φ-'])
+def __getattr__(name):
+    if name in _BASES:
+        b = globals()[name] = _BASES[name]()
+        return b
+    raise AttributeError("module '"+__name__+"' has no attribute '"+name+"'")
 
 # ↑↑↑↑↑↑↑↑↑↑↑↑ Creation of most used bases ↑↑↑↑↑↑↑↑↑↑↑↑ #
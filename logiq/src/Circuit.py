@@ -0,0 +1,148 @@
+from .Operator import DiagOp, PermOp
+from .Qbits import split_Op
+from .Qerrors import IllegalOperationError, InitializationError
+from .Qmath import np
+
+
+#### Circuit.py
+#
+# This file contains the Circuit class:
+# it records the operators applied to some (symbolic) qudits, to apply them later to the real quantum states.
+# Before that, the recorded operators are optimized (merged and cancelled where it's possible)
+#
+####
+
+
+# ↓↓↓↓↓↓↓↓↓↓↓↓ Circuit class ↓↓↓↓↓↓↓↓↓↓↓↓ #
+
+class Circuit:
+    """
+    A quantum circuit: the operators applied to it (with `|`, `^` and `apply`) are recorded and not executed.
+    `circuit.run(q)` applies them to the quantum state `q`, as if they were applied directly to it.
+
+    + `qudits`: the number of qubits or the list of the dimensions of the qudits
+
+    `circuit[i]` is the i-th qudit of the circuit, the qudits can be composed as the qubits (e.g. `circuit[0] @ circuit[2]`)
+    """
+
+    def __init__(self, qudits):
+        try:
+            self._dims = [2] * qudits if isinstance(qudits, int) else list(qudits)
+            if len(self._dims) == 0: raise ValueError('A circuit needs at least one qudit')
+            self._axes = list(range(len(self._dims)))
+            self._root = self
+            self._gates = []       # the recorded operators, as a list of (operator, indexes of the qudits)
+            self._compiled = None
+
+        except Exception as e:
+            raise InitializationError('Error to initialize the Circuit', e)
+
+
+    def _sub(self, axes):
+        # the qudits `axes` of this circuit
+        if len(axes) != len(set(axes)):
+            raise IllegalOperationError('Duplicate qudit not allowed')
+        c = Circuit.__new__(Circuit)
+        c._root = self._root ; c._axes = list(axes)
+        c._dims = [self._root._dims[a] for a in axes]
+        return c
+
+
+    @property
+    def spaces(self):
+        "Return the number of qudits of this circuit"
+        return len(self._dims)
+
+
+    def apply(self, operator, pos = None):
+        "Record an operator (the positions `pos` are the same used by Qbits)"
+        root = self._root
+        for op, axes in split_Op([range(d) for d in self._dims], operator, pos): # NB: split_Op needs only the lengths
+            root._gates.append((op, [self._axes[a] for a in axes]))
+        root._compiled = None
+
+
+    def apply2all(self, op):
+        "Record the operator for every qudit"
+        for i in range(self.spaces): self.apply(op, [i])
+
+
+    def compile(self):
+        """
+        Returns the optimized list of (operator, indexes of the qudits) that will be applied, where:
+        + the consecutive operators on the same qudits are merged in one (e.g. the single qudit gates)
+        + the diagonal operators are merged even if there are other diagonal operators between them
+        + the operators whose product is the identity (e.g. `Op` and `~Op`) are removed
+
+        The result is computed only once (until a new operator is recorded)
+        """
+        root = self._root
+        if root._compiled is None:
+            out = []
+            for op, axes in root._gates:
+                _push(out, op, axes)
+            root._compiled = out
+        return root._compiled
+
+
+    def run(self, q):
+        """
+        Apply the (optimized) recorded operators to the quantum state `q`
+        (it can be also a StateBatch or a QbitPool), which must have the same qudits of the circuit
+        """
+        dims = [len(x) for x in q._qbits] if hasattr(q, '_qbits') else getattr(q, '_dims', [getattr(q, 'dim', None)])
+        if dims != self._root._dims:
+            raise IllegalOperationError("The qudits of the quantum state don't match the ones of the circuit")
+        for op, axes in self.compile():
+            q.apply(op, axes)
+
+
+    def __getitem__(self, i):
+        if isinstance(i, slice): return self._sub(self._axes[i])
+        if isinstance(i, (list, tuple)): return self._sub([self._axes[j] for j in i])
+        return self._sub([self._axes[i]])
+
+
+    def __matmul__(self, other):
+        if not isinstance(other, Circuit) or other._root is not self._root:
+            raise IllegalOperationError('Only the qudits of the same circuit can be composed')
+        return self._sub(self._axes + other._axes)
+
+
+    def __len__(self):
+        "The number of operators that will be applied"
+        return len(self.compile())
+
+
+    def __repr__(self):
+        return '<Circuit @ '+hex(id(self))+', '+str(self.spaces)+' qudits, '+str(len(self._root._gates))+' operators recorded>'
+
+# ↑↑↑↑↑↑↑↑↑↑↑↑ Circuit class ↑↑↑↑↑↑↑↑↑↑↑↑ #
+
+
+
+# ↓↓↓↓↓↓↓↓↓↓↓↓ Optimization functions ↓↓↓↓↓↓↓↓↓↓↓↓ #
+
+def _push(gates, op, axes):
+    # appends the operator to the optimized list `gates`, merging it with a previous one on the same qudits if it's possible:
+    # the operator can go back through the ones on other qudits (and the diagonal ones, if it's diagonal)
+    diag = isinstance(op, DiagOp)
+    for i in range(len(gates)-1, -1, -1):
+        prev, prev_axes = gates[i]
+        if prev_axes == axes:
+            merged = op * prev
+            if _isId(merged): del gates[i]
+            else: gates[i] = (merged, axes)
+            return
+        if set(prev_axes) & set(axes) and not (diag and isinstance(prev, DiagOp)):
+            break
+    gates.append((op, axes))
+
+
+def _isId(op):
+    # True if the operator is the identity (NB: also the global phase is considered)
+    if isinstance(op, DiagOp): return np.allclose(op._diag, 1)
+    if isinstance(op, PermOp): return np.array_equal(op._src, np.arange(len(op._src))) and np.allclose(op._phase, 1)
+    return np.allclose(op.mtx, np.identity(len(op)))
+
+# ↑↑↑↑↑↑↑↑↑↑↑↑ Optimization functions ↑↑↑↑↑↑↑↑↑↑↑↑ #
@@ -1,7 +1,7 @@
-from .Basis import Basis, CanonBasis, hadamard
+from .Basis import Basis, CanonBasis, rd
 from .Qerrors import DimensionError, InitializationError, NotAllowError
-from .Qmath import ket, kron, matrix, nkron, np, npmath, vector
-from .qtils import Vdigit, find, isScalar, mod_square, states2list, str2states
+from .Qmath import _array, _content_hash, _frozen, _kron_hash, _perm_hash, ket, matrix, np, npmath, vector
+from .qtils import Vdigit, close, find, isScalar, memo, mod_square, prod, states2list, str2states, what_validation
 
 
 #### Operator.py
@@ -20,14 +20,16 @@ class Op(matrix):
     + `operator`: a matrix that represent the operator
     """
 
-    def __init__(self, operator, _pieces = None, no_cpy = False):
+    __slots__ = ('_pieces', '_hash', '_key')
+
+    def __init__(self, operator, _pieces = None, no_cpy = False, _trusted = False):
         try:
             if isinstance(operator, Op):
                 super().__init__(operator.mtx, no_cpy=True)
                 self._pieces = operator._pieces
             else:
                 super().__init__(operator, no_cpy=no_cpy)
-                if not self.isUnitary():
+                if not _trusted and what_validation() and not self.isUnitary():
                     raise ValueError('Matrix not unitary')
             
             if _pieces is None:
@@ -39,6 +41,11 @@ class Op(matrix):
             raise InitializationError("Error to initialize Op", e)
     
 
+    @property
+    def shape(self):
+        return self.mtx.shape
+
+
     def _isSep(self):
         return len(self._pieces) > 1
 
@@ -56,11 +63,19 @@ class Op(matrix):
     
 
     def __mul__(self, other):
-        if isinstance(other, Op):
-            return Op(self.mtx * other.mtx, no_cpy=True)
+        if isinstance(other, DiagOp):
+            return Op(np.multiply(self.mtx, other._diag), no_cpy=True, _trusted=True)
+
+        elif isinstance(other, PermOp):
+            M = np.empty(self.shape, complex)
+            M[:, other._src] = np.multiply(self.mtx, other._phase)
+            return Op(M, no_cpy=True, _trusted=True)
+
+        elif isinstance(other, Op):
+            return Op(self.mtx @ other.mtx, no_cpy=True, _trusted=True)
 
         elif isScalar(other) and mod_square(other)==1:
-            return Op(self.mtx * other)
+            return Op(self.mtx * other, _trusted=True)
 
         return super().__mul__(other)
     
@@ -70,11 +85,12 @@ class Op(matrix):
 
 
     def __matmul__(self, other):
+        # the Kronecker product is not computed, the operators are kept as pieces
         if isinstance(other, Op):
-            return Op(kron(self.mtx, other.mtx), _pieces=self._pieces+other._pieces, no_cpy=True)
+            return kron_op(self._pieces + other._pieces)
 
         elif isinstance(other, int):
-            return Op(nkron(self, other), _pieces=self._pieces*other, no_cpy=True)
+            return kron_op(self._pieces * other)
 
         return super().__matmul__(other)
 
@@ -83,12 +99,48 @@ class Op(matrix):
         return npmath.equal(self, other)
 
 
+    def __hash__(self):
+        # the content hash (see Qmath) is computed only once, because an operator is immutable
+        if getattr(self, '_hash', None) is None: self._hash = self._contentHash()
+        return self._hash
+
+
+    def _memoKey(self):
+        # the key of the values cached from this operator: the exact content hash
+        # (the hash rounds the values, so the operators only close each other have the same one)
+        if getattr(self, '_key', None) is None: self._key = self._contentHash(exact=True)
+        return self._key
+
+
+    def _contentHash(self, exact = False):
+        return _content_hash(self.mtx, exact)
+
+
+    def _perm(self):
+        # the permutation and the phases of this operator (as PermOp), None if it's not stored in that way
+        return None
+
+
+    def isUnitary(self):
+        return memo.get(('unitary', self._memoKey()), super().isUnitary)
+
+
     def __invert__(self):
-         return Op(self.mtx.H)
+        # (the adjoint matrix is shared, through the cache, by all the equal operators)
+        M = memo.get(('adjoint', self._memoKey()), lambda: _frozen(self.mtx.conj().T))
+        return Op(M, no_cpy=True, _trusted=True)
+
+
+    def transpose(self):
+        super().transpose() ; self._hash = self._key = None
+
+
+    def conj(self):
+        super().conj() ; self._hash = self._key = None
 
 
     def __len__(self):
-        return self.mtx.shape[0]
+        return self.shape[0]
 
 
     @staticmethod
@@ -100,41 +152,78 @@ class Op(matrix):
         + `basis` (optional): the basis which represents the rules (if it's the standard basis it's unnecessary)
         """
 
-        op = matrix.filled(len(rules), 0)
-
+        n = len(rules)
         if basis is None:
-            basis = CanonBasis(len(rules))
+            #the (canonical) basis is needed only to understand the symbols
+            if any(isinstance(x, str) for r in rules.items() for x in r):
+                basis = CanonBasis(n)
         elif isinstance(basis, (list,tuple)):
             #TODO: improve with __getitem__ in Vdigit && lazy init of CanonBasis
             symb = [str(v) for v in Vdigit(basis)]
             basis = CanonBasis(len(symb), symb)
+        canon = basis is None or isinstance(basis, CanonBasis)
         
+        cols = {} ; states = {}
         for k, v in rules.items():
             i = find(basis.symbols, k.strip('|> ')) if isinstance(k, str) else k
+
+            if canon and isinstance(v, int):
+                cols[i] = (v, 1) if v>=0 else (-v, -1) #NB: beware of state 0: -0 is 0
+                continue
             
             if isinstance(v, str):
                 state = basis.transform(ket(*states2list(str2states(v), basis.symbols)))
             elif isinstance(v, int):
-                state = basis[v] if v>=0 else -basis[-v] #NB: beware of state 0: -0 is 0
+                state = basis[v] if v>=0 else -basis[-v]
             else:
                 state = v
 
-            op += state * ~basis[i]
+            if canon:
+                s = _array(state).ravel()
+                nz = np.flatnonzero(s)
+                if len(nz) == 1:
+                    cols[i] = (nz[0], s[nz[0]])
+                    continue
+            states[i] = state
+
+        if len(cols) == n:
+            #every state goes in another state of the basis (up to a phase): it's a permutation (or diagonal) operator
+            src = np.full(n, -1) ; phase = np.zeros(n, complex)
+            for i, (r, c) in cols.items():
+                src[r] = i ; phase[r] = c
+            if np.array_equal(src, np.arange(n)):
+                return DiagOp(phase)
+            elif not (src < 0).any():
+                return PermOp(src, phase)
+
+        op = matrix.filled(n, 0)
+        for i, (r, c) in cols.items():
+            op[r, i] = c
+        for i, state in states.items():
+            if canon: op[:, i] = _array(state).ravel()
+            else: op += state * ~basis[i]
                 
-        return Op(op.npm(), no_cpy=True)
+        return Op(op.mtx, no_cpy=True)
 
 
     @staticmethod
     def neutral():
-        "Returns an operator `N` such that `N @ x = x`"
-        return Op([1], _pieces=[])
-        #[[1]] @ x = x
+        "Returns an operator `N` such that `N @ x = x` (always the same object, an operator is immutable)"
+        if None not in _IDENTITIES: _IDENTITIES[None] = Op([1], _pieces=[], _trusted=True) #[[1]] @ x = x
+        return _IDENTITIES[None]
 
 
     @staticmethod
     def Id(n):
-        "Return an `n X n` identity operator"
-        return Op(np.identity(n), no_cpy=True)
+        "Return an `n X n` identity operator (always the same object for the same `n`, an operator is immutable)"
+        if n not in _IDENTITIES: _IDENTITIES[n] = DiagOp(np.ones(n), _trusted=True)
+        return _IDENTITIES[n]
+
+
+    @staticmethod
+    def diag(values):
+        "Return the diagonal operator which has `values` on the diagonal"
+        return DiagOp(values)
 
 
     @staticmethod
@@ -143,7 +232,7 @@ class Op(matrix):
         Generates the 'phase gate' according to the giving `phase`  
         if `deg` is `True` the phase will be evaluated in degrees and not in radians"""
         if deg: phase = (2*np.pi*phase)/360.0
-        return Op([[1, 0], [0, np.e**(1j * phase)]])
+        return DiagOp([1, np.e**(1j * phase)], _trusted=True)
 
 
     @staticmethod
@@ -154,18 +243,337 @@ class Op(matrix):
         + `U`: the operator to apply to the second qubit if the first is "true"
         """
         if len(U) != 2: raise DimensionError('The operator U must be a 2x2 matrix')
+        if isinstance(U, DiagOp):
+            return DiagOp([1, 1, U._diag[0], U._diag[1]], _trusted=True)
+        elif isinstance(U, PermOp):
+            return PermOp([0, 1, 2+U._src[0], 2+U._src[1]], [1, 1, U._phase[0], U._phase[1]], _trusted=True)
         return Op([
             [1, 0, 0, 0],
             [0, 1, 0, 0],
             [0, 0, U[0,0], U[0,1]],
             [0, 0, U[1,0], U[1,1]]
-            ])
+            ], _trusted=isinstance(U, Op))
 
 
     @staticmethod
     def random(n):
         "Generates a random `n X n` operator"
-        return Op(matrix.rand_unitary(n), no_cpy=True)
+        return Op(matrix.rand_unitary(n), no_cpy=True, _trusted=True)
+
+
+
+
+class DiagOp(Op):
+    """
+    A diagonal operator (e.g. a phase gate), it stores only the values of the diagonal
+
+    + `diag`: the values of the diagonal
+    """
+
+    __slots__ = ('_diag',)
+
+    def __init__(self, diag, _pieces = None, _trusted = False):
+        try:
+            self._diag = np.array(diag, complex).ravel()
+            self._mtx = None
+            self._pieces = [self] if _pieces is None else _pieces
+
+            if not _trusted and what_validation() and not self.isUnitary():
+                raise ValueError('Matrix not unitary')
+
+        except Exception as e:
+            raise InitializationError("Error to initialize Op", e)
+
+
+    def _dense(self):
+        return np.diag(self._diag)
+
+
+    @property
+    def shape(self):
+        return (len(self._diag), len(self._diag))
+
+
+    def isUnitary(self):
+        return np.allclose(np.abs(self._diag), 1)
+
+
+    def _perm(self):
+        return np.arange(len(self._diag)), self._diag
+
+
+    def _contentHash(self, exact = False):
+        return _perm_hash(*self._perm(), exact)
+
+
+    def _contract(self, psi, axes):
+        # a diagonal operator is applied multiplying element by element
+        order = sorted(range(len(axes)), key=lambda i: axes[i])
+        d = self._diag.reshape([psi.shape[a] for a in axes]).transpose(order)
+        shape = [psi.shape[a] if a in axes else 1 for a in range(psi.ndim)]
+        return psi * d.reshape(shape)
+
+
+    def __mul__(self, other):
+        if isinstance(other, DiagOp):
+            return DiagOp(self._diag * other._diag, _trusted=True)
+
+        elif isinstance(other, PermOp):
+            return PermOp(other._src, self._diag * other._phase, _trusted=True)
+
+        elif isinstance(other, Op):
+            return Op(np.multiply(self._diag[:, None], other.mtx), no_cpy=True, _trusted=True)
+
+        elif isinstance(other, vector) and other.isCol():
+            if len(other) != len(self._diag): raise DimensionError('Operator and vector dimensions must be equal')
+            return vector(self._diag[:, None] * other._a, no_cpy=True)
+
+        elif isScalar(other) and mod_square(other)==1:
+            return DiagOp(self._diag * other, _trusted=True)
+
+        return super().__mul__(other)
+
+
+    def __invert__(self):
+        return DiagOp(self._diag.conj(), _trusted=True)
+
+
+    def transpose(self):
+        pass
+
+
+    def conj(self):
+        self._diag = self._diag.conj() ; self._mtx = None ; self._hash = self._key = None
+
+
+
+
+class PermOp(Op):
+    """
+    A permutation operator with phases (e.g. X, CNOT, SWAP), it stores only where each state goes (and its phase):  
+    the i-th value of the new state is `phase[i] * state[src[i]]`
+
+    + `src`: for each state, the index of the state that goes there
+    + `phase` (optional): for each state, the phase that multiplies it
+    """
+
+    __slots__ = ('_src', '_phase')
+
+    def __init__(self, src, phase = None, _pieces = None, _trusted = False):
+        try:
+            self._src = np.array(src, int).ravel()
+            self._phase = np.ones(len(self._src), complex) if phase is None else np.array(phase, complex).ravel()
+            self._mtx = None
+            self._pieces = [self] if _pieces is None else _pieces
+
+            if not _trusted and what_validation() and not self.isUnitary():
+                raise ValueError('Matrix not unitary')
+
+        except Exception as e:
+            raise InitializationError("Error to initialize Op", e)
+
+
+    def _dense(self):
+        M = np.zeros(self.shape, complex)
+        M[np.arange(len(self._src)), self._src] = self._phase
+        return M
+
+
+    def _inverse(self):
+        inv = np.empty_like(self._src)
+        inv[self._src] = np.arange(len(self._src))
+        return inv
+
+
+    @property
+    def shape(self):
+        return (len(self._src), len(self._src))
+
+
+    def isUnitary(self):
+        return np.array_equal(np.sort(self._src), np.arange(len(self._src))) and np.allclose(np.abs(self._phase), 1)
+
+
+    def _perm(self):
+        return self._src, self._phase
+
+
+    def _contentHash(self, exact = False):
+        return _perm_hash(*self._perm(), exact)
+
+
+    def _contract(self, psi, axes):
+        # a permutation operator is applied gathering the values
+        k = len(axes)
+        psi = np.moveaxis(psi, axes, range(k))
+        shape = psi.shape
+        psi = psi.reshape(len(self._src), -1)[self._src] * self._phase[:, None]
+        return np.moveaxis(psi.reshape(shape), range(k), axes)
+
+
+    def __mul__(self, other):
+        if isinstance(other, PermOp):
+            return PermOp(other._src[self._src], self._phase * other._phase[self._src], _trusted=True)
+
+        elif isinstance(other, DiagOp):
+            return PermOp(self._src, self._phase * other._diag[self._src], _trusted=True)
+
+        elif isinstance(other, Op):
+            return Op(np.multiply(self._phase[:, None], other.mtx[self._src]), no_cpy=True, _trusted=True)
+
+        elif isinstance(other, vector) and other.isCol():
+            if len(other) != len(self._src): raise DimensionError('Operator and vector dimensions must be equal')
+            return vector(other._a[self._src] * self._phase[:, None], no_cpy=True)
+
+        elif isScalar(other) and mod_square(other)==1:
+            return PermOp(self._src, self._phase * other, _trusted=True)
+
+        return super().__mul__(other)
+
+
+    def __invert__(self):
+        inv = self._inverse()
+        return PermOp(inv, self._phase.conj()[inv], _trusted=True)
+
+
+    def transpose(self):
+        inv = self._inverse()
+        self._src, self._phase = inv, self._phase[inv] ; self._mtx = None ; self._hash = self._key = None
+
+
+    def conj(self):
+        inv = self._inverse()
+        self._src, self._phase = inv, self._phase.conj()[inv] ; self._mtx = None ; self._hash = self._key = None
+
+
+
+
+class KronOp(Op):
+    """
+    The Kronecker product of some operators (i.e. `op1 @ op2 @ ...`), it's kept factored:  
+    the complete matrix is built only when it's needed and it's applied piece by piece
+
+    + `pieces`: the list of operators
+
+    NB: the hash and the comparison with another product of pieces with the same dimensions are computed piece by piece,
+    so the products equal to a dense operator (or made of other pieces, e.g. `(2*A) @ B` and `A @ (2*B)`) may have a different hash
+    (unless all the pieces are permutations with phases, e.g. diagonal operators)
+    """
+
+    __slots__ = ()
+
+    def __init__(self, pieces):
+        self._pieces = list(pieces)
+        self._mtx = None
+
+
+    def _dense(self):
+        # (the complete matrix is shared, through the cache, by all the products of the same operators)
+        def expand():
+            M = self._pieces[0].mtx
+            for op in self._pieces[1:]:
+                M = np.kron(M, op.mtx)
+            return _frozen(M)
+        return memo.get(('kron',) + tuple(op._memoKey() for op in self._pieces), expand)
+
+
+    @property
+    def shape(self):
+        n = prod((len(op) for op in self._pieces))
+        return (n, n)
+
+
+    def isUnitary(self):
+        return all(op.isUnitary() for op in self._pieces)
+
+
+    def _perm(self):
+        # the Kronecker product of permutations is a permutation (so the complete matrix isn't needed)
+        src, phase = np.zeros(1, int), np.ones(1, complex)
+        for op in self._pieces:
+            p = op._perm()
+            if p is None: return None
+            src = (src[:, None] * len(op) + p[0]).ravel() ; phase = np.kron(phase, p[1])
+        return src, phase
+
+
+    def _contentHash(self, exact = False):
+        p = self._perm()
+        if p is not None: return _perm_hash(*p, exact)
+        return _kron_hash([op._contentHash(exact) for op in self._pieces], exact)
+
+
+    def __eq__(self, other):
+        if not (isinstance(other, KronOp) and [len(op) for op in self._pieces] == [len(op) for op in other._pieces]):
+            return super().__eq__(other)
+        if all(a == b for a, b in zip(self._pieces, other._pieces)): return True
+        # the products can be equal only if every piece is proportional to the other one (then the complete matrices are compared)
+        if not all(_proportional(a, b) for a, b in zip(self._pieces, other._pieces)): return False
+        return super().__eq__(other)
+
+
+    __hash__ = Op.__hash__
+
+
+    def _contract(self, psi, axes):
+        # each piece is applied to its own axes (if the pieces don't fit the axes the complete matrix is used)
+        i = 0 ; split = []
+        for op in self._pieces:
+            j = i ; l = 1
+            while l < len(op) and j < len(axes):
+                l *= psi.shape[axes[j]] ; j += 1
+            if l != len(op): return super()._contract(psi, axes)
+            split.append(axes[i:j]) ; i = j
+
+        for op, sub in zip(self._pieces, split):
+            psi = op._contract(psi, sub)
+        return psi
+
+
+    def __mul__(self, other):
+        if isinstance(other, KronOp) and [len(op) for op in self._pieces] == [len(op) for op in other._pieces]:
+            return KronOp([a * b for a, b in zip(self._pieces, other._pieces)])
+
+        elif isinstance(other, vector) and other.isCol():
+            if len(other) != len(self): raise DimensionError('Operator and vector dimensions must be equal')
+            dims = [len(op) for op in self._pieces]
+            psi = self._contract(other._a.reshape(dims), list(range(len(dims))))
+            return vector(psi.reshape(-1, 1), no_cpy=True)
+
+        elif isScalar(other) and mod_square(other)==1:
+            return KronOp([self._pieces[0] * other] + self._pieces[1:])
+
+        return super().__mul__(other)
+
+
+    def __invert__(self):
+        return KronOp([~op for op in self._pieces])
+
+
+    def transpose(self):
+        self._pieces = [Op(op.mtx.T, _trusted=True) for op in self._pieces]
+        self._mtx = None ; self._hash = self._key = None
+
+
+    def conj(self):
+        self._pieces = [~op for op in self._pieces]
+        self._mtx = None ; self._hash = self._key = None
+
+
+
+def _proportional(a, b):
+    # True if the operator `a` is (about) a multiple of `b`
+    A, B = _array(a), _array(b)
+    k = np.argmax(np.abs(B))
+    if B.flat[k] == 0: return not A.any()
+    return bool(close(A, A.flat[k] / B.flat[k] * B).all())
+
+
+def kron_op(pieces):
+    # the (lazy) Kronecker product of the operators in `pieces`
+    if len(pieces) == 0: return Op.neutral()
+    elif len(pieces) == 1: return pieces[0]
+    return KronOp(pieces)
 
 
 
@@ -174,12 +582,36 @@ class MeasureOp(matrix):
 
     #A special type of operator to permit the creation of a "measurement operator"
     #(because normally an operator can't be non-unitary)
+    #It's the projector |b><b| (where b is the i-th eigenstate of basis) divided by state[i],
+    #the matrix is built only when it's needed
+
+    __slots__ = ('_b', '_s', '_pieces')
 
     def __init__(self, state, basis, i):
-        super().__init__(((basis[i] * ~basis[i])/state[i]).npm(), no_cpy=True)
+        self._b = _array(basis[i]).ravel()
+        self._s = state[i]
+        self._mtx = None
         self._pieces = [self]
 
 
+    def _dense(self):
+        return np.outer(self._b, self._b.conj()) / self._s
+
+
+    @property
+    def shape(self):
+        return (len(self._b), len(self._b))
+
+
+    def _contract(self, psi, axes):
+        # a projector is applied as <b|psi> (on the axes) and then |b>
+        k = len(axes)
+        psi = np.moveaxis(psi, axes, range(k))
+        shape = psi.shape
+        psi = np.outer(self._b, self._b.conj() @ psi.reshape(len(self._b), -1)) / self._s
+        return np.moveaxis(psi.reshape(shape), range(k), axes)
+
+
     def _isSep(self):
         return False
 
@@ -193,7 +625,7 @@ class MeasureOp(matrix):
 
     
     def __len__(self):
-        return self.mtx.shape[0]
+        return len(self._b)
 
 
 # ↑↑↑↑↑↑↑↑↑↑↑↑ Op classes ↑↑↑↑↑↑↑↑↑↑↑↑ #
@@ -202,13 +634,34 @@ class MeasureOp(matrix):
 
 # ↓↓↓↓↓↓↓↓↓↓↓↓ Creation of most used Operators ↓↓↓↓↓↓↓↓↓↓↓↓ #
 
-Op.I = Op( [[1,0],[0,1]] )
-Op.X = Op( [[0,1],[1,0]] )
-Op.Y = Op( [[0,-1j],[1j,0]] )
-Op.Z = Op( [[1,0],[0,-1]] )
-Op.H = Op(hadamard.npm(), no_cpy=True)
-Op.cnot = Op( [[1,0,0,0],[0,1,0,0],[0,0,0,1],[0,0,1,0]] )
-Op.swap = Op( [[1,0,0,0],[0,0,1,0],[0,1,0,0],[0,0,0,1]] )
-Op.sqrtSwap = Op( [[1,0,0,0],[0,0.5*(1+1j),0.5*(1-1j),0],[0,0.5*(1-1j),0.5*(1+1j),0],[0,0,0,1]] )
+_OPS = {
+    'I': lambda: DiagOp( [1,1], _trusted=True ),
+    'X': lambda: PermOp( [1,0], _trusted=True ),
+    'Y': lambda: PermOp( [1,0], [-1j,1j], _trusted=True ),
+    'Z': lambda: DiagOp( [1,-1], _trusted=True ),
+    'H': lambda: Op( [[rd,rd],[rd,-rd]], _trusted=True ),
+    'cnot': lambda: PermOp( [0,1,3,2], _trusted=True ),
+    'swap': lambda: PermOp( [0,2,1,3], _trusted=True ),
+    'sqrtSwap': lambda: Op( [[1,0,0,0],[0,0.5*(1+1j),0.5*(1-1j),0],[0,0.5*(1-1j),0.5*(1+1j),0],[0,0,0,1]], _trusted=True ),
+}
+
+
+class _lazyOp:
+    # an operator of _OPS (e.g. Op.H) created only the first time it's used, then it takes the place of this object
+
+    def __init__(self, name):
+        self.name = name
+
+
+    def __get__(self, obj, cls):
+        op = _OPS[self.name]()
+        setattr(Op, self.name, op)
+        return op
+
+
+for _name in _OPS: setattr(Op, _name, _lazyOp(_name))
+
+
+_IDENTITIES = {} #the identity operators created by Op.Id, for each dimension (and Op.neutral, with the key None)
 
 # ↑↑↑↑↑↑↑↑↑↑↑↑ Creation of most used Operators ↑↑↑↑↑↑↑↑↑↑↑↑ #
@@ -1,9 +1,9 @@
-from .abs_Qstate import _Qstate, need_norm, unreal
+from .abs_Qstate import _outcome, _Qstate, mutates, need_norm, unreal
 from .Basis import Basis, CanonBasis
-from .Operator import MeasureOp, Op
+from .Operator import Op
 from .Qbits import Qbits
 from .Qerrors import IllegalOperationError, InitializationError
-from .Qmath import roundedVector, vector
+from .Qmath import _array, roundedVector, vector
 from .qtils import equal, formatProbs, val2str
 
 
@@ -56,10 +56,17 @@ class Qbit(_Qstate):
 
 
     def measure(self, basis = None):
-        i, _, basis = super().measure(basis)
-        self._state = vector(basis[i])
+        basis = self._measureBasis(basis)
+        return basis.ew[self._collapse(basis, self._rng)]
+
 
-        return basis.ew[i]
+    @mutates
+    def _collapse(self, basis, rng = None):
+        # measures this qubit in `basis` (with the generator `rng`) and returns the index of the outcome
+        p = _array(basis.transform(self._getState())).ravel()
+        i = _outcome((p * p.conj()).real, rng)
+        self._state = vector(basis[i])
+        return i
 
 
     def __matmul__(self, q):
@@ -113,11 +120,17 @@ class Qbit_ent(Qbit, _Qstate):
         self._ent.apply(op, self._pos)
 
 
-    def measure(self, basis = None):
-        i, state, basis = _Qstate.measure(self, basis)
-        self._ent.apply(MeasureOp(state, basis, i), self._pos)
+    def _disentangle(self, state):
+        # it comes back to be a simple Qbit, with the given state
+        self.__class__ = Qbit
+        self._state = state
+        self._ent = None
+        del self._pos
+
 
-        return basis.ew[i]
+    def measure(self, basis = None):
+        basis = self._measureBasis(basis)
+        return basis.ew[self._ent._measure([self], basis, self._rng)]
 
 
 
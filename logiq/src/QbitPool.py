@@ -0,0 +1,286 @@
+from .abs_Qstate import _outcomes, _Qstate, mutates, need_norm, unreal
+from .Basis import CanonBasis
+from .Operator import DiagOp
+from .Qbit import Qbit
+from .Qerrors import DimensionError, IllegalOperationError, InitializationError
+from .Qmath import _array, np, vector
+from .qtils import make_rng, need_round, round_values
+
+
+#### QbitPool.py
+#
+# This file contains the QbitPool and Qbit_pool classes.
+# A QbitPool stores many independent qudits (with the same dimension) as a single array,
+# so the operators and the measurements are applied to all of them at once.
+# Qbit_pool is the single qudit of a pool, it works like a normal Qbit
+#
+####
+
+
+# ↓↓↓↓↓↓↓↓↓↓↓↓ QbitPool class ↓↓↓↓↓↓↓↓↓↓↓↓ #
+
+class QbitPool:
+    """
+    A pool of independent qudits with the same dimension, stored together (one row for each qudit)
+
+    + `states`: the states of the qudits, a matrix N×d (every row is a state) or a list of vectors
+    + `basis` (optional): the basis of the qudits, it serves to measure them and to represent them
+    + `normalize` (optional): if True the states will be normalized
+
+    `Op | pool` applies the operator to all the qudits, `pool[i]` is the i-th qudit (a Qbit),
+    `pool[i:j]` (or `pool[list of indexes]`) is another pool that shares the same qudits
+    """
+
+    _rng = None #the random number generator of this pool (None means the logiq one)
+
+    def __init__(self, states, basis = None, normalize = None):
+        try:
+            if isinstance(states, (list, tuple)) and len(states) > 0 and isinstance(states[0], (vector, Qbit)):
+                states = [_array(s._getState() if isinstance(s, Qbit) else s).ravel() for s in states]
+            data = np.array(states, complex)
+            if data.ndim != 2: raise DimensionError('The states of a QbitPool must be a matrix N×d')
+
+            norms = np.linalg.norm(data, axis=1)
+            if not np.allclose(norms, 1):
+                if (normalize is None and need_norm()) or normalize:
+                    if not norms.all(): raise DimensionError("The null vector isn't normalizable")
+                    data /= norms[:, None]
+                else:
+                    raise IllegalOperationError('A quantum state must have norm 1')
+
+            self._data = data
+            self._idx = slice(None)
+            self._root = self
+            self._views = {}   # the qudits of this pool already requested (pool[i] is always the same object)
+            self._out = {}     # the qudits that have left the pool (because entangled with other ones)
+            self._basis = CanonBasis(data.shape[1]) if basis is None else basis
+            if len(self._basis) != data.shape[1]:
+                raise ValueError('Lengths of states and basis must be equal')
+
+        except Exception as e:
+            raise InitializationError('Error to initialize the QbitPool', e)
+
+
+    @staticmethod
+    def fill(state, n, basis = None):
+        "Generate a pool of `n` qudits all in the state `state` (a vector or a Qbit)"
+        if isinstance(state, Qbit):
+            if basis is None: basis = state._basis
+            state = state._getState()
+        return QbitPool(np.tile(_array(state).ravel(), (n, 1)), basis)
+
+
+    def _sub(self, rows):
+        # a pool made of the rows `rows` (of the root pool), sharing the data
+        pool = QbitPool.__new__(QbitPool)
+        pool._root = self._root ; pool._idx = rows ; pool._basis = self._basis
+        return pool
+
+
+    def _rows(self):
+        # the indexes (of the root pool) of the qudits of this pool
+        return np.arange(len(self._root._data))[self._idx]
+
+
+    def _detached(self):
+        # the qudits of this pool that have left it, as a list of (position in this pool, qudit)
+        out = self._root._out
+        if not out: return []
+        if self is self._root: return list(out.items())
+        rows = self._rows()
+        return [(j, out[r]) for j, r in enumerate(rows) if r in out]
+
+
+    @property
+    @unreal
+    def states(self):
+        "The states of the qudits (a matrix N×d, every row is a state)"
+        data = self._root._data[self._idx].copy()
+        for j, q in self._detached():
+            data[j] = _array(q._getState()).ravel()
+        return data
+
+
+    @property
+    def basis(self):
+        return self._basis
+
+
+    @property
+    def dim(self):
+        "The dimension of every qudit"
+        return self._root._data.shape[1]
+
+
+    def setBasis(self, basis):
+        "Set the default basis for the qudits of this pool"
+        if len(basis) != self.dim:
+            raise ValueError('Lengths of states and basis must be equal')
+        self._basis = basis
+
+
+    def setRng(self, seed = None):
+        "Set the random number generator used to measure these qudits (see `set_rng`), `None` means the one of logiq"
+        self._root._rng = None if seed is None else make_rng(seed)
+
+
+    @mutates
+    def apply(self, op, pos = None):
+        "Apply an operator to all the qudits of this pool"
+        if len(op) != self.dim:
+            raise DimensionError("The operator's dimension doesn't match the qudits where it acts")
+
+        D = self._root._data
+        block = D[self._idx]
+        block = block * op._diag if isinstance(op, DiagOp) else block @ _array(op).T
+        if need_round(): round_values(block, (0,1), parts=True)
+        D[self._idx] = block
+
+        for _, q in self._detached(): q.apply(op)
+
+
+    def apply2all(self, op):
+        "Apply the operator to all the qudits of this pool"
+        self.apply(op)
+
+
+    def _measureBasis(self, basis):
+        return _Qstate._measureBasis(self, basis)
+
+
+    def _coeffs(self, basis):
+        # the coefficients of the states in `basis` (as Basis.transform does)
+        data = self._root._data[self._idx]
+        return data if isinstance(basis, CanonBasis) else data @ _array(basis).T
+
+
+    @mutates
+    def measure(self, basis = None):
+        """
+        Measure all the qudits of this pool in Basis `basis`,
+        the result will be the array of the eigenvalues associated
+        """
+        basis = self._measureBasis(basis)
+        c = self._coeffs(basis)
+        detached = self._detached()
+        if not detached:
+            i = _outcomes((c * c.conj()).real, self._root._rng)
+            self._root._data[self._idx] = _array(basis).T[i]
+        else: #the qudits that have left the pool are measured only through their own Qbit
+            keep = np.ones(len(c), bool) ; keep[[j for j, _ in detached]] = False
+            i = np.zeros(len(c), int)
+            i[keep] = _outcomes((c[keep] * c[keep].conj()).real, self._root._rng)
+            self._root._data[self._rows()[keep]] = _array(basis).T[i[keep]]
+
+        ew = np.asarray(basis.ew)
+        out = ew[i]
+        for j, q in detached: out[j] = q.measure(basis)
+        return out
+
+
+    @unreal
+    def probs(self, basis = None):
+        "Returns the probabilities to measure each state of `basis` (a matrix N×d, a row for every qudit)"
+        if basis is None: basis = self._basis
+        c = self._coeffs(basis)
+        p = (c * c.conj()).real
+        for j, q in self._detached(): p[j] = q._probs(basis)[0]
+        return p
+
+
+    @unreal
+    def prob(self, i, basis = None):
+        "Returns the probabilities (one for every qudit) to measure the `i`-th state if the basis `basis` is used"
+        return self.probs(basis)[:, i]
+
+
+    def __getitem__(self, i):
+        if isinstance(i, slice) or not np.isscalar(i):
+            return self._sub(self._rows()[i])
+
+        r = int(self._rows()[i]) ; root = self._root
+        if r in root._out: return root._out[r]
+        if r not in root._views: root._views[r] = Qbit_pool(root, r)
+        return root._views[r]
+
+
+    def __iter__(self):
+        for i in range(len(self)): yield self[i]
+
+
+    def __len__(self):
+        return len(self._rows()) if self is not self._root else len(self._root._data)
+
+
+    def __str__(self):
+        return '\n'.join(str(q) for q in self)
+
+
+    def __repr__(self):
+        return '<QbitPool @ '+hex(id(self))+', '+str(len(self))+' qudits of dimension '+str(self.dim)+'>'
+
+# ↑↑↑↑↑↑↑↑↑↑↑↑ QbitPool class ↑↑↑↑↑↑↑↑↑↑↑↑ #
+
+
+
+# ↓↓↓↓↓↓↓↓↓↓↓↓ Qbit_pool class ↓↓↓↓↓↓↓↓↓↓↓↓ #
+
+class Qbit_pool(Qbit):
+
+    # A single qudit of a QbitPool: its state is a row of the pool,
+    # its basis and its random number generator are the ones of the pool (unless they are set for this qudit)
+
+    _own_basis = None
+    _own_rng = None
+
+    def __init__(self, pool, row):
+        self._pool = pool
+        self._row = row
+        self._qbits = [self]
+        self._length = pool.dim
+        self._ent = None
+
+
+    @property
+    def _state(self):
+        # a view of the row (so the changes in place are made directly in the pool)
+        return vector(self._pool._data[self._row].reshape(-1, 1), no_cpy=True)
+
+
+    @_state.setter
+    def _state(self, state):
+        self._pool._data[self._row] = _array(state).ravel()
+
+
+    @property
+    def _basis(self):
+        return self._pool._basis if self._own_basis is None else self._own_basis
+
+
+    @_basis.setter
+    def _basis(self, basis):
+        self._own_basis = basis
+
+
+    @property
+    def _rng(self):
+        return self._pool._rng if self._own_rng is None else self._own_rng
+
+
+    @_rng.setter
+    def _rng(self, rng):
+        self._own_rng = rng
+
+
+    def _entangle(self, ent, pos):
+        # an entangled qudit leaves the pool: it becomes a normal Qbit (the pool will manage it separately)
+        state, basis, rng = vector(self._state), self._basis, self._rng
+        pool, row = self._pool, self._row
+        pool._out[row] = self ; pool._views.pop(row, None)
+        self.__class__ = Qbit
+        del self._pool, self._row
+        self.__dict__.pop('_own_basis', None) ; self.__dict__.pop('_own_rng', None)
+        self._state, self._basis, self._rng = state, basis, rng
+        Qbit._entangle(self, ent, pos)
+
+# ↑↑↑↑↑↑↑↑↑↑↑↑ Qbit_pool class ↑↑↑↑↑↑↑↑↑↑↑↑ #
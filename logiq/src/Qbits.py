@@ -1,17 +1,21 @@
-from .abs_Qstate import _Qstate, unreal
-from .Basis import Basis
+import math
+
+from .abs_Qstate import _Qstate, _outcome, mutates, states_version, unreal
+from .Basis import Basis, CanonBasis, KronBasis, dynSymb
 from .Operator import MeasureOp, Op
-from .Qerrors import IllegalOperationError, InitializationError
-from .Qmath import ket, math, matrix, roundedVector
-from .qtils import Vdigit, equal, formatProbs, mod_square, prod, val2str
+from .Qerrors import DimensionError, IllegalOperationError, InitializationError
+from .Qmath import _array, _frozen, ket, matrix, np, roundedVector, tensor_apply, vector
+from .qtils import Vdigit, equal, formatProbs, need_round, prod, val2str, what_backend, what_mps, what_rng
 
 #### Qbits.py
 #
-# This file contains the Qbits and Qent classes.
-# These 2 classes serve to create composed quantum states,
+# This file contains the Qbits, Qent, Qmps and Qstab classes.
+# These classes serve to create composed quantum states,
 # i.e. multiple qubit (or better: every kind of qudit) states, even entangled.
 # 
-# The Qent classes is a particular class that manage (hiddenly) the entangled states
+# The Qent classes is a particular class that manage (hiddenly) the entangled states,
+# Qmps is the same but it stores the state as a Matrix Product State (see set_backend),
+# Qstab stores the states reachable with only Clifford gates (H, S, X, Y, Z, CNOT, ...) as a stabilizer tableau
 #
 ####
 
@@ -19,7 +23,8 @@ from .qtils import Vdigit, equal, formatProbs, mod_square, prod, val2str
 # ↓↓↓↓↓↓↓↓↓↓↓↓ Common function ↓↓↓↓↓↓↓↓↓↓↓↓ #
 
 def complete_Op(qbits, operator, pos):
-    # it builds the operator to be applied, according to the given operator and the start position
+    # it builds the (complete) operator to be applied, according to the given operator and the start position
+    # NB: the operators are applied using split_Op, this one builds explicitly the Kronecker product
     real_op = Op.neutral()
     if pos is None: pos=0
     
@@ -47,6 +52,63 @@ def complete_Op(qbits, operator, pos):
     return real_op
 
 
+def span(qbits, index, size):
+    # it returns the first indexes in `index` needed to cover an operator of dimension `size`
+    out = [] ; l = 1
+    for i in index:
+        if l >= size: break
+        out.append(i)
+        l *= len(qbits[i])
+
+    if l != size:
+        raise DimensionError("The operator's dimension doesn't match the qudits where it acts")
+    return out
+
+
+def split_Op(qbits, operator, pos):
+    # it splits the operator to be applied into a list of (operator, indexes of the qubits where it acts)
+    # following the same rules of complete_Op, but without building the identities and the Kronecker products
+    if pos is None: pos=0
+
+    if isinstance(operator, (list, tuple)): #set of operators
+        if isinstance(pos, (list, tuple)):
+            ops = [(operator[i], i) for i in range(len(qbits)) if i in pos]
+        else:
+            ops = [(op, None) for op in operator]
+    else: #signle operators
+        ops = [(operator, None)]
+
+    out = []
+    index = list(pos) if isinstance(pos, (list, tuple)) else list(range(pos, len(qbits)))
+    for op, start in ops:
+        for piece in op._pieces:
+            if start is not None: index = list(range(start, len(qbits)))
+            axes = span(qbits, index, len(piece))
+            out.append((piece, axes))
+            index = index[len(axes):] ; start = None
+
+    return out
+
+
+def _symbolIndex(basis, s):
+    # the index of the state of `basis` whose symbol is `s`
+    if isinstance(basis.symbols, dynSymb): return int(s)
+    return list(basis.symbols).index(s)
+
+
+def _parseSymbols(s, bases):
+    # the indexes of the states of `bases` (one for each basis) whose symbols, one after the other, are `s`
+    idx = []
+    for b in bases:
+        symbols = [str(x) for x in b.symbols]
+        match = [k for k, x in enumerate(symbols) if x and s.startswith(x)]
+        if not match: raise ValueError("'"+s+"' isn't a symbol of these qubits")
+        k = max(match, key=lambda k: len(symbols[k]))
+        idx.append(k) ; s = s[len(symbols[k]):]
+    if s: raise ValueError("'"+s+"' isn't a symbol of these qubits")
+    return idx
+
+
 def isEnt(q):
     return q._ent is not None
 
@@ -63,11 +125,14 @@ def get_ent(qents):
     return ent
 
 
-def gen_ent(qents):
+def gen_ent(qents, op = None):
     # if doesn't exist a common Qbits_ent, it generates it
+    # (with the dense backend, a Qstab if the operator that will be applied, `op`, is a Clifford gate and all the qubits are in stabilizer states)
     qent = get_ent(qents)
     if qent is None:
-        qent = Qent(qents)
+        if what_backend() == 'mps': qent = Qmps(qents)
+        elif op is not None and _clifford(op) is not None and all(_isStab(q) for q in qents): qent = Qstab(qents)
+        else: qent = Qent(qents)
 
     return qent
 
@@ -79,7 +144,12 @@ def gen_ent(qents):
 
 class Qbits(_Qstate):
     
-    # Multiple qubit calss
+    # Multiple qubit calss.
+    # The qubits keep their own states (a product state is never expanded): the probabilities, the amplitudes
+    # and the measurements in the bases of the single qubits are computed factor by factor (see _factors),
+    # the complete vector is built only when it's needed and it's kept until a quantum state changes
+
+    _cache = None #(states_version(), complete vector) the last complete vector built
 
     def __init__(self, qbits, basis=None):
         try:
@@ -103,15 +173,77 @@ class Qbits(_Qstate):
         self._basis = basis
 
     
+    def _isExact(self):
+        # True if every entangled state of these qubits is completely in this one
+        ents = {id(q._ent): q._ent for q in self._qbits if isEnt(q)}.values()
+        return all(set(ent._qbits) <= set(self._qbits) for ent in ents)
+
+
     def _getState(self):
+        # (the vector is read-only: it's shared by all the calls until the next change)
+        if self._cache is not None and self._cache[0] == states_version(): return self._cache[1]
+        if self._isExact():
+            state = self._exactState()
+        else:
+            state = ket(1)
+            for q in self._qbits:
+                state = state @ q._getState()
+        _frozen(_array(state))
+        self._cache = (states_version(), state)
+        return state
+
+
+    def _factors(self):
+        # the independent parts of these qubits: every qubit not entangled and every entangled state (with only its qubits that are here),
+        # as a list of (qubit or entangled state, positions of its qubits in these qubits)
+        factors = {}
+        for j, q in enumerate(self._qbits):
+            f = q._ent if isEnt(q) else q
+            factors.setdefault(id(f), (f, []))[1].append(j)
+        return list(factors.values())
+
+
+    def _pieces(self, basis):
+        # the bases of the single qubits whose product is `basis` (by default the bases of the qubits),
+        # None if the states of `basis` are entangled
+        dims = [len(q) for q in self._qbits]
+        if basis is None: return [q._basis for q in self._qbits]
+        if isinstance(basis, CanonBasis): return [CanonBasis(d) for d in dims]
+        if isinstance(basis, KronBasis) and [len(b) for b in basis._pieces] == dims: return basis._pieces
+        if len(dims) == 1: return [basis]
+        return None
+
+
+    def _factorCoeffs(self, f, js, pieces):
+        # the coefficients of the factor `f` (with its qubits in the positions js) in the product of the bases of its qubits,
+        # as a matrix (states of the product X all the other qubits of f)
+        if isinstance(f, Qbits): return f._coeffs([self._qbits[j] for j in js], [pieces[j] for j in js])
+        return _array(pieces[js[0]].transform(f._state)).reshape(-1, 1)
+
+
+    def _index(self, i, pieces, basis):
+        # the indexes (one for each qubit) of the `i`-th state of the product of `pieces`,
+        # `i` can be also its symbol in `basis` (or the symbols of the qubits one after the other, if `basis` is None)
+        if isinstance(i, str):
+            if basis is not None: i = _symbolIndex(basis, i)
+            else: return _parseSymbols(i, pieces)
+        return [int(k) for k in np.unravel_index(i, [len(b) for b in pieces])]
+
+
+    def _exactState(self):
+        # the product of the (independent) states of the qubits, reordered as these qubits
         ent = get_ent(self._qbits)
-        if ent is not None and len(ent) == len(self): #entangled state "equal" to this one
-            self._qbits[0]._ent._prepare(self._qbits, lambda x,i: x[i]._pos)
-            return self._qbits[0]._ent._state
-        state = ket(1)
+        if ent is not None: return ent._permuted(self._qbits)
+        state, order = ket(1), []
         for q in self._qbits:
-            state = state @ q._getState()
-        return state
+            if not isEnt(q):
+                state, order = state @ q._state, order + [q]
+            elif q not in order:
+                state, order = state @ q._ent._state, order + q._ent._qbits
+        if order == self._qbits: return state
+        psi = _array(state).reshape([len(q) for q in order])
+        psi = psi.transpose([order.index(q) for q in self._qbits])
+        return ket(psi.ravel())
 
 
     
@@ -123,46 +255,117 @@ class Qbits(_Qstate):
 
 
     def apply(self, operator, pos=None):
-        if pos is not None or not isinstance(operator, (Op, MeasureOp)):
-            operator = complete_Op(self._qbits, operator, pos)
-        
-        if operator._isSep():
-            i=0
-            for op in operator._pieces:
-                if len(op) == len(self._qbits[i]):
-                    self._qbits[i].apply(op)
-                    i+=1
-                else:
-                    l=len(op) ; ent=[]
-                    while(l>0):
-                        ent.append(self._qbits[i])
-                        l-=len(self._qbits[i]) ; i+=1
-                    qent = gen_ent(ent)
-                    qent._apply_qs(op, ent)
-                    
-        else:
-            qent = gen_ent(self._qbits)
+        if pos is None and isinstance(operator, (Op, MeasureOp)) and not operator._isSep():
+            qent = gen_ent(self._qbits, operator)
             qent._apply_qs(operator, self._qbits)
+            return
+
+        for op, index in split_Op(self._qbits, operator, pos):
+            qs = [self._qbits[i] for i in index]
+            if len(qs) == 1:
+                qs[0].apply(op)
+            else:
+                qent = gen_ent(qs, op)
+                qent._apply_qs(op, qs)
     
 
 
+    def _probs(self, basis):
+        b = basis if basis is not None else self._basis
+        pieces = self._pieces(b)
+        if pieces is None: return super()._probs(basis)
+
+        # the product of the probabilities of every factor, with the axes reordered as these qubits
+        p, order = np.ones(1), []
+        for f, js in self._factors():
+            c = self._factorCoeffs(f, js, pieces)
+            p = np.kron(p, np.einsum('ij,ij->i', c, c.conj()).real) ; order += js
+        if order != sorted(order):
+            p = p.reshape([len(self._qbits[j]) for j in order]).transpose(np.argsort(order)).ravel()
+        return p, (Vdigit([q._basis.symbols for q in self._qbits]) if b is None else b.symbols)
+
+
+    @unreal
+    def prob(self, i, basis = None):
+        """
+        Returns the probability to measure the `i`-th state if the basis `basis` is used
+        (by default the basis of these qubits or, if they don't have it, the product of the bases of every qubit)
+
+        + `i`: the index of the state or its symbol (e.g. `'0+1'` for the bases of the qubits)
+        + `basis` (optional): the basis of the measurement
+        """
+        b = basis if basis is not None else self._basis
+        pieces = self._pieces(b)
+        if pieces is None:
+            if isinstance(i, str): i = _symbolIndex(b, i)
+            return super().prob(i, b)
+
+        idx = self._index(i, pieces, b) ; p = 1
+        for f, js in self._factors():
+            c = self._factorCoeffs(f, js, pieces)[np.ravel_multi_index([idx[j] for j in js], [len(pieces[j]) for j in js])]
+            p *= np.vdot(c, c).real
+        return np.float64(p)
+
+
+    @unreal
+    def amplitude(self, i, basis = None):
+        """
+        Returns the amplitude of the `i`-th state if the basis `basis` is used
+        (by default the basis of these qubits or, if they don't have it, the product of the bases of every qubit)
+
+        + `i`: the index of the state or its symbol (e.g. `'0+1'` for the bases of the qubits)
+        + `basis` (optional): the basis where the state is seen
+        """
+        if not self._isExact():
+            raise IllegalOperationError('The amplitudes of qubits entangled with other qubits are not defined')
+        b = basis if basis is not None else self._basis
+        pieces = self._pieces(b)
+        if pieces is None:
+            if isinstance(i, str): i = _symbolIndex(b, i)
+            return (~b[i] * self._getState()).item()
+
+        idx = self._index(i, pieces, b) ; a = 1
+        for f, js in self._factors():
+            a *= self._factorCoeffs(f, js, pieces)[np.ravel_multi_index([idx[j] for j in js], [len(pieces[j]) for j in js]), 0]
+        return a
+
+
+
     def measure(self, basis = None):
-        qent = get_ent(self._qbits)
-        if qent is None:
-            self._state = self._getState()
-            i, state, basis = super().measure(basis)
-            self._state = None
-
-            self.apply(MeasureOp(state, basis, i))
-            return basis.ew[i]
-        else:
-            return qent.measure(basis)
+        # (by default the basis of these qubits or, if they don't have it, the product of the bases of every qubit)
+        if basis is None: basis = self._basis
+        pieces = self._pieces(basis)
+        if pieces is None: #the states of the basis are entangled: all the qubits are measured together
+            return basis.ew[gen_ent(self._qbits)._measure(self._qbits, basis, self._rng)]
+
+        # every factor is measured on its own (without entangling them)
+        idx = [0] * len(self._qbits)
+        for f, js in self._factors():
+            bs = [pieces[j] for j in js]
+            if isinstance(f, Qbits):
+                i = f._measure([self._qbits[j] for j in js], bs[0] if len(bs) == 1 else KronBasis(bs), self._rng)
+                for j, k in zip(js, np.unravel_index(i, [len(b) for b in bs])): idx[j] = int(k)
+            else:
+                idx[js[0]] = f._collapse(bs[0], self._rng)
+
+        if basis is not None and not isinstance(basis, KronBasis): return basis.ew[np.ravel_multi_index(idx, [len(b) for b in pieces])]
+        ew = np.complex128(1) #(the eigenvalues of a KronBasis are the products of the ones of its pieces)
+        for b, k in zip(pieces, idx): ew = ew * b.ew[k]
+        return ew
+
+
+    def disentangle(self):
+        """
+        Splits the entangled states of these qubits in independent states, wherever it's possible
+        """
+        for ent in {id(q._ent): q._ent for q in self._qbits if isEnt(q)}.values():
+            ent.disentangle()
 
         
 
 
     def printAs(self, basis):
-        isent = all((not isEnt(q) for q in self._qbits))
+        isent = not self._isExact()
         state = basis.transform(self._getState())
         s = ''
         for i in range(len(self)):
@@ -179,10 +382,7 @@ class Qbits(_Qstate):
     def printProbs(self, basis = None):
         b = basis if basis is not None else self._basis
         if b is None:
-            T = matrix((1))
-            for q in self._qbits:
-                T @= q._basis
-            state = roundedVector(T * self._getState())
+            state = KronBasis([q._basis for q in self._qbits]).transform(self._getState())
             symb = Vdigit([q._basis.symbols for q in self._qbits])
         
         else:
@@ -195,19 +395,15 @@ class Qbits(_Qstate):
     @unreal
     def __str__(self):
         if self._basis is None:
-            T = matrix((1)) ; isent=False
-            for q in self._qbits:
-                T @= q.basis
-                if isEnt(q): isent=True
-            
-            state = roundedVector(T*self._getState())
+            isent = not self._isExact()
+            state = KronBasis([q._basis for q in self._qbits]).transform(self._getState())
             s = "" ; st = Vdigit([q._basis.symbols for q in self._qbits])
 
             for e in state:
                 val = next(st)
-                if e != 0: s += val2str(e) + '|' + val + '> '
+                if not equal(e, 0): s += val2str(e) + '|' + val + '> '
             
-            if isent and get_ent(self._qbits) is None:
+            if isent:
                 s = s.replace('+', '±').replace('-', '±')
             
             return s[:-1]
@@ -230,12 +426,13 @@ class Qent(Qbits, _Qstate):
             state = ket(1)
             
             for qs in qbits:
+                if qs in qs_list: continue
                 if isEnt(qs):
                     state @= qs._ent._state
                     for q in qs._ent._qbits:
                         q._entangle(self, len(qs_list))
                         qs_list.append(q)
-                elif qs not in qs_list:
+                else:
                     state @= qs._state
                     qs._entangle(self, len(qs_list))
                     qs_list.append(qs)
@@ -250,12 +447,14 @@ class Qent(Qbits, _Qstate):
         return self._state
 
 
+    @mutates
     def apply(self, operator, pos=None):
-        if pos is not None:
-            index = self._prepare(pos)
-            operator = complete_Op(self._qbits, operator, index)
-        
-        _Qstate.apply(self, operator)
+        # the operator is contracted only with the axes of the qubits where it acts,
+        # so the qubits don't need to be adjacent (or reordered)
+        dims = [len(q) for q in self._qbits]
+        for op, axes in split_Op(self._qbits, operator, pos):
+            self._state = tensor_apply(op, self._state, dims, axes)
+        if need_round(): self._state.round_error((0,1))
 
 
     def apply2all(self, op):
@@ -263,80 +462,767 @@ class Qent(Qbits, _Qstate):
 
 
     def _apply_qs(self, operator, qs):
-        index = self._prepare(qs, get = lambda x,i: x[i]._pos)
-        operator = complete_Op(self._qbits, operator, index)
-        self.apply(operator)
+        self.apply(operator, [q._pos for q in qs])
 
 
     def measure(self, basis=None):
-        i, _, basis = _Qstate.measure(self, basis)
-        self._state = basis[i]
-        return basis.ew[i]
+        basis = self._measureBasis(basis)
+        return basis.ew[self._measure(self._qbits, basis, self._rng)]
 
 
-
-    def _prepare(self, pos, get = lambda x,i: x[i]):
-        if isinstance(pos, (list,tuple)):
-            index = i = min((get(pos, i) for i in range(len(pos))))
-            for p in range(len(pos)):
-                j = get(pos, p)
-                while i > j:
-                    j = get(pos, j)
-                self._swap(i, j)
-                i+=1
-            return index
+    @mutates
+    def _measure(self, qs, basis, rng = None):
+        # measures the qubits in qs: the outcome is picked (with the generator `rng`) from their marginal distribution (in `basis`),
+        # then the measured qubits leave this entangled state and the others keep only the (rescaled)
+        # slice of the outcome, without building any operator
+        k = len(qs)
+        dims = [len(q) for q in qs]
         
-        return pos
-
-
-    def _swap(self, i, j):
-        if i == j: return
-        lens = [len(b) for b in self._qbits]
-        b = min(len(self[i]), len(self[j]))
-        state = Vdigit(lens)
-        for x in range(b):
-            for y in range(x+1, b):
-                while state.hasNext:
-                    state.ds[i] = x ; state.ds[j] = y
-                    ind_i = state.extract()
-                    state.ds[i] = y ; state.ds[j] = x
-                    ind_j = state.extract()
-
-                    #swap!
-                    tmp= self._state[ind_i]
-                    self._state[ind_i] = self._state[ind_j]
-                    self._state[ind_j] = tmp
-
-                    state._pp_ent(i,j,len(state.ds)-1)
+        if isinstance(basis, CanonBasis):
+            pieces = [CanonBasis(d) for d in dims] if k > 1 else [basis]
+        elif isinstance(basis, KronBasis) and [len(b) for b in basis._pieces] == dims:
+            pieces = basis._pieces
+        else:
+            pieces = [basis]
         
-        tmp = self._qbits[i]
-        self._qbits[i] = self._qbits[j]
-        self._qbits[j] = tmp
-        #update
-        self[i]._entangle(self, i)
-        self[j]._entangle(self, j)
+        amp = self._coeffs(qs, pieces)
+        p = np.einsum('ij,ij->i', amp, amp.conj()).real
+        i = _outcome(p, rng)
+        rest = amp[i] / np.sqrt(p[i])
+        
+        if len(pieces) == k: #the eigenstate is the product of the eigenstates of every qubit
+            self._detach(qs, [b[j] for b, j in zip(pieces, np.unravel_index(i, dims))], rest)
+        else:
+            self._detach(qs, [basis[i]], rest)
+            qs[0]._ent._split()
+        self._split()
+        return i
+
+
+    def disentangle(self):
+        """
+        Splits this entangled state in independent states (single qubits or smaller entangled states),
+        wherever the qubits are no more correlated each other
+        """
+        self._split(groups=True)
+
+
+    def _split(self, groups=False):
+        # splits off every qubit in a pure state (i.e. not correlated with the others);
+        # if `groups` the remaining qubits are partitioned by the pairwise correlations, and every
+        # part is split off if it's really separable (a Schmidt rank 1 between it and the others)
+        qs = self._qbits
+        if len(qs) == 0: return
+        rhos = [self._rho([q]) for q in qs]
+        parts = [[q] for q, rho in zip(qs, rhos) if _isPure(rho)]
+        others = [i for i in range(len(qs)) if not _isPure(rhos[i])]
+
+        if groups and len(others) > 1:
+            comp = {i: {i} for i in others}
+            for a in others:
+                for b in others:
+                    if a < b and comp[a] is not comp[b] and \
+                       not np.allclose(self._rho([a,b]), np.kron(rhos[a], rhos[b])):
+                        comp[a] |= comp[b]
+                        for c in comp[b]: comp[c] = comp[a]
+            comps = list({id(c): sorted(c) for c in comp.values()}.values())
+            if len(comps) > 1:
+                parts += [[qs[i] for i in c] for c in comps]
+            
+        if sum(len(part) for part in parts) == len(qs): parts.pop()   # the last one is what remains
+
+        for part in parts: self._pop(part)
+        if len(self._qbits) == 1:
+            self._qbits[0]._disentangle(vector(self._state, no_cpy=True))
+
+
+    def _pop(self, qs):
+        # splits off the qubits in `qs` (if they are separable from the others)
+        psi = self._sub_tensor(qs)
+        left = psi.shape[0] <= psi.shape[1]
+        rho = psi @ psi.conj().T if left else psi.conj().T @ psi
+        w, v = np.linalg.eigh(rho)
+        if not np.isclose(w[-1], np.sum(w)): return
+
+        u = v[:,-1] if left else psi @ v[:,-1]
+        u = u / _phase(u) / np.linalg.norm(u)
+        rest = u.conj() @ psi
+
+        self._detach(qs, [ket(u)], rest)
+
+
+    def _detach(self, qs, states, rest):
+        # the qubits in qs leave this entangled state, with the new `states` (one for each qubit or
+        # only one for all of them), `rest` is the new state of the remaining qubits
+        others = [q for q in self._qbits if q not in qs]
+        self._qbits = others
+        self._state = ket(rest)
+        self._length = len(self._state)
+        for pos, q in enumerate(others): q._entangle(self, pos)
+
+        if len(states) == len(qs):
+            for q, state in zip(qs, states): q._disentangle(vector(state))
+        else:
+            ent = Qent.__new__(Qent)
+            _Qstate.__init__(ent, vector(states[0]), None, list(qs), len(states[0]))
+            for pos, q in enumerate(qs): q._entangle(ent, pos)
+
+
+    def _rho(self, qs):
+        # the reduced density matrix (as ndarray) of the qubits in qs
+        psi = self._sub_tensor(qs)
+        return psi @ psi.conj().T
+
+
+
+    def _permuted(self, qs):
+        # returns the state with the qubits ordered as in `qs`, using a single permutation of the axes
+        dims = [len(q) for q in self._qbits]
+        psi = _array(self._state).reshape(dims).transpose([q._pos for q in qs])
+        return vector(psi.reshape(self._state.shape), no_cpy=True)
     
 
+    def _tensor(self):
+        # the state seen as a tensor with one axis for each qubit
+        return _array(self._state).reshape([len(q) for q in self._qbits])
+
+
+    def _sub_tensor(self, qs):
+        # the state as a matrix (qubits in qs X all the others qubits)
+        axes = [q if isinstance(q, int) else q._pos for q in qs]
+        psi = np.moveaxis(self._tensor(), axes, range(len(axes)))
+        return psi.reshape(prod((psi.shape[i] for i in range(len(axes)))), -1)
+
+
+    def _coeffs(self, qs, pieces):
+        # the state as a matrix (states of the product of `pieces` X all the other qubits), where `pieces`
+        # are the bases of the qubits in qs (one for each qubit, or only one for all of them)
+        psi = np.moveaxis(self._tensor(), [q._pos for q in qs], range(len(qs)))
+        if len(pieces) == 1: psi = psi.reshape(len(pieces[0]), -1)
+        for j, b in enumerate(pieces):
+            if not isinstance(b, CanonBasis): psi = b._contract(psi, [j])
+        return psi.reshape(prod((len(b) for b in pieces)), -1)
+
+
+    @unreal
+    def marginal(self, qs):
+        """
+        Returns the probabilities to measure (in the canonical basis) the qubits in `qs`, ignoring all the others
+
+        + `qs`: a list of qubits (or positions) of this entangled state
+        """
+        psi = self._sub_tensor(qs)
+        return ket(np.einsum('ij,ij->i', psi, psi.conj()).real)
+
+
+    @unreal
+    def reduced_density(self, qs):
+        """
+        Returns the reduced density matrix of the qubits in `qs`, i.e. tracing out all the others
+
+        + `qs`: a list of qubits (or positions) of this entangled state
+        """
+        return matrix(self._rho(qs))
+
+
     def _calc_p_state(self, pos):
         #try to build the pos state using the probabilitiy to measure it
-        state=[]
-        for s in range(len(self._qbits[pos])):
-            state.append(self._get_module(pos, s))
-        return ket(*state)
-
-
-    def _get_module(self, pos, state):
-        # get the value of module of a certain state in a certain position
-        d = 1
-        for i in range(pos+1): d *= len(self._qbits[i])
-        dim = len(self._state)//d
-        step = dim*len(self._qbits[pos])
-        val=0 ; sign=0
-        for i in range(state*dim, len(self._state), step):
-            for j in range(dim):
-                sign += self._state[i+j]
-                val += mod_square(self._state[i+j])
-
-        return math.sqrt(val)
+        psi = self._sub_tensor([pos])
+        return ket(np.sqrt(np.einsum('ij,ij->i', psi, psi.conj()).real))
+
+
+
+def _isPure(rho):
+    # a (reduced) density matrix is pure if it has only one eigenvalue not null
+    w = np.linalg.eigvalsh(rho)
+    return np.isclose(w[-1], np.sum(w))
+
+
+def _phase(u):
+    # the phase of the first biggest amplitude of u (the global phase of a state detached: that amplitude becomes real positive)
+    a = np.abs(u)
+    k = np.flatnonzero(np.isclose(a, a.max()))[0]
+    return u[k] / a[k]
 
 # ↑↑↑↑↑↑↑↑↑↑↑↑ Qent class ↑↑↑↑↑↑↑↑↑↑↑↑ #
+
+
+
+
+# ↓↓↓↓↓↓↓↓↓↓↓↓ Qmps class ↓↓↓↓↓↓↓↓↓↓↓↓ #
+
+class Qmps(Qent):
+
+    # An entangled state stored as a Matrix Product State: a chain of tensors (left bond, qudit, right bond),
+    # one for each qubit (in the order of _qbits). The gates are applied updating only the tensors where
+    # they act (the bonds are truncated with SVD), the complete vector is built only when it's needed.
+    # The chain is kept in the mixed canonical form: _oc is its orthogonality center (None if unknown)
+
+    def __init__(self, qbits):
+        try:
+            qs_list = [] ; sites = [] ; centers = []
+
+            for qs in qbits:
+                if qs in qs_list: continue
+                if isEnt(qs):
+                    ent = qs._ent
+                    if isinstance(ent, Qmps):
+                        centers.append(None if ent._oc is None else len(sites) + ent._oc)
+                        sites += ent._sites
+                    else:
+                        sites += _to_mps(ent._tensor())
+                        centers.append(len(sites) - 1)
+                    for q in list(ent._qbits):
+                        q._entangle(self, len(qs_list))
+                        qs_list.append(q)
+                else:
+                    sites.append(_array(qs._state).reshape(1, -1, 1))
+                    qs._entangle(self, len(qs_list))
+                    qs_list.append(qs)
+
+            _Qstate.__init__(self, None, None, qs_list, prod((len(q) for q in qs_list)))
+            self._sites = sites
+            # the single qubits are normalized, so the center is known if there is at most one chain
+            self._oc = 0 if len(centers) == 0 else centers[0] if len(centers) == 1 else None
+
+        except Exception as e:
+            raise InitializationError('Error to initialize the Qbits entangled', e)
+
+
+    @property
+    def _state(self):
+        # the complete vector, built contracting all the chain
+        psi = np.ones((1, 1))
+        for A in self._sites:
+            psi = (psi @ A.reshape(A.shape[0], -1)).reshape(-1, A.shape[2])
+        return ket(psi.ravel())
+
+
+    @_state.setter
+    def _state(self, state):
+        if state is not None:
+            self._sites = _to_mps(_array(state).reshape([len(q) for q in self._qbits]))
+            self._oc = len(self._sites) - 1
+
+
+    @property
+    def bonds(self):
+        "Returns the bond dimensions between the qubits of this state"
+        return [A.shape[2] for A in self._sites[:-1]]
+
+
+    @mutates
+    def apply(self, operator, pos=None):
+        for op, axes in split_Op(self._qbits, operator, pos):
+            if len(axes) == 1:
+                self._sites[axes[0]] = op._contract(self._sites[axes[0]], [1])
+                if not isinstance(op, Op) and self._oc != axes[0]: self._oc = None #not unitary
+            else:
+                self._apply_block(op, [self._qbits[a] for a in axes])
+
+
+    def _apply_block(self, op, qs):
+        # the qubits in qs are moved (with swaps) to be adjacent and in the same order of qs,
+        # then the operator is applied to their contracted tensor that is splitted again
+        for j in range(1, len(qs)):
+            while qs[j]._pos != qs[j-1]._pos + 1:
+                p = qs[j]._pos
+                self._swap(p-1 if p > qs[j-1]._pos else p)
+
+        start = qs[0]._pos ; k = len(qs)
+        self._center(start)
+        theta = self._sites[start]
+        for A in self._sites[start+1 : start+k]:
+            theta = np.tensordot(theta, A, axes=(-1, 0))
+        theta = op._contract(theta, list(range(1, k+1)))
+        self._sites[start : start+k] = _split_sites(theta)
+        self._oc = start + k - 1
+
+
+    def _swap(self, p):
+        # swaps the qubits in position p and p+1
+        self._center(p)
+        theta = np.tensordot(self._sites[p], self._sites[p+1], axes=(-1, 0)).transpose(0, 2, 1, 3)
+        self._sites[p : p+2] = _split_sites(theta)
+        self._oc = p + 1
+        q0, q1 = self._qbits[p], self._qbits[p+1]
+        self._qbits[p], self._qbits[p+1] = q1, q0
+        q1._entangle(self, p) ; q0._entangle(self, p+1)
+
+
+    def _center(self, k):
+        # moves the orthogonality center to the site k: the sites on its left become left-isometric
+        # and the ones on its right become right-isometric (with QR decompositions)
+        sites = self._sites
+        left, right = (0, len(sites) - 1) if self._oc is None else (self._oc, self._oc)
+        for p in range(left, k):
+            A = sites[p]
+            Q, R = np.linalg.qr(A.reshape(-1, A.shape[2]))
+            sites[p] = Q.reshape(A.shape[0], A.shape[1], -1)
+            sites[p+1] = np.tensordot(R, sites[p+1], axes=(1, 0))
+        for p in range(right, k, -1):
+            A = sites[p]
+            Q, R = np.linalg.qr(A.reshape(A.shape[0], -1).T)
+            sites[p] = Q.T.reshape(-1, A.shape[1], A.shape[2])
+            sites[p-1] = np.tensordot(sites[p-1], R.T, axes=(-1, 0))
+        self._oc = k
+
+
+    def _rho(self, qs):
+        if len(qs) != 1: return super()._rho(qs)
+        # the reduced density matrix of a single qubit needs only its tensor, if it's the orthogonality center
+        k = qs[0] if isinstance(qs[0], int) else qs[0]._pos
+        self._center(k)
+        A = self._sites[k]
+        return np.einsum('asb,atb->st', A, A.conj())
+
+
+    def _calc_p_state(self, pos):
+        return ket(np.sqrt(np.diag(self._rho([pos])).real))
+
+
+    @mutates
+    def _measure(self, qs, basis, rng = None):
+        dims = [len(q) for q in qs]
+        if isinstance(basis, CanonBasis):
+            pieces = [CanonBasis(d) for d in dims] if len(qs) > 1 else [basis]
+        elif isinstance(basis, KronBasis) and [len(b) for b in basis._pieces] == dims:
+            pieces = basis._pieces
+        elif len(qs) == 1:
+            pieces = [basis]
+        else: #the eigenstates are entangled, the complete vector is needed
+            return super()._measure(qs, basis, rng)
+
+        # every qubit is measured (with its own basis) and it leaves the chain
+        i = 0
+        for q, b in zip(qs, pieces):
+            i = i * len(q) + self._measure_site(q, b, rng)
+        self._split()
+        return i
+
+
+    def _measure_site(self, q, basis, rng = None):
+        k = q._pos
+        B = None if isinstance(basis, CanonBasis) else _array(basis)
+        rho = self._rho([k]) ; A = self._sites[k]
+        p = np.diag(rho).real if B is None else np.einsum('is,st,it->i', B, rho, B.conj()).real
+        i = _outcome(p, rng)
+
+        M = (A[:, i, :] if B is None else np.einsum('s,asb->ab', B[i], A)) / np.sqrt(p[i])
+        if k+1 < len(self._sites):
+            self._sites[k+1] = np.tensordot(M, self._sites[k+1], axes=(1, 0)) ; self._oc = k+1
+        elif k > 0:
+            self._sites[k-1] = np.tensordot(self._sites[k-1], M, axes=(-1, 0)) ; self._oc = k-1
+        self._remove(k, vector(basis[i]))
+        return i
+
+
+    def _remove(self, k, state):
+        # the qubit in position k leaves the chain with the state `state`
+        q = self._qbits.pop(k) ; del self._sites[k]
+        if self._oc is not None and self._oc > k: self._oc -= 1
+        for pos in range(k, len(self._qbits)): self._qbits[pos]._entangle(self, pos)
+        self._length //= len(q)
+        q._disentangle(state)
+
+
+    def _split(self, groups=False):
+        # the chain is compressed, then it's cut where the bond dimension is 1:
+        # the single qubits come back to be independent qubits and the other pieces become new Qmps
+        if len(self._qbits) == 0: return
+        self._compress()
+
+        cuts = [p+1 for p, A in enumerate(self._sites[:-1]) if A.shape[2] == 1]
+        for a, b in reversed(list(zip([0] + cuts, cuts + [len(self._sites)]))):
+            if b - a == len(self._sites): break
+            if b - a == 1:
+                u = self._sites[a].ravel()
+                c = np.linalg.norm(u) * _phase(u)
+                if a > 0: self._sites[a-1] = self._sites[a-1] * c
+                elif b < len(self._sites): self._sites[b] = self._sites[b] * c
+                self._remove(a, ket(u / c))
+            else:
+                ent = Qmps.__new__(Qmps)
+                qs = self._qbits[a:b]
+                _Qstate.__init__(ent, None, None, qs, prod((len(q) for q in qs)))
+                ent._sites = self._sites[a:b] ; ent._oc = 0
+                for pos, q in enumerate(qs): q._entangle(ent, pos)
+                del self._qbits[a:b] ; del self._sites[a:b]
+                self._length //= len(ent)
+                for pos in range(a, len(self._qbits)): self._qbits[pos]._entangle(self, pos)
+
+        if len(self._qbits) == 1:
+            A = self._sites[0]
+            self._remove(0, ket(A.ravel()))
+
+
+    def _compress(self):
+        # brings the chain in the canonical form, truncating every bond according to the mps settings
+        sites = self._sites
+        self._center(len(sites) - 1)
+        for p in range(len(sites) - 1, 0, -1):
+            A = sites[p]
+            U, S, Vh = _svd(A.reshape(A.shape[0], -1))
+            sites[p] = Vh.reshape(-1, A.shape[1], A.shape[2])
+            sites[p-1] = np.tensordot(sites[p-1], U * S, axes=(-1, 0))
+        self._oc = 0
+
+
+
+def _svd(M):
+    # the SVD of M, truncated according to the mps settings (the norm is preserved)
+    U, S, Vh = np.linalg.svd(M, full_matrices=False)
+    max_bond, cutoff = what_mps()
+    keep = max(1, int(np.sum(S > cutoff * S[0])))
+    if max_bond is not None: keep = min(keep, max_bond)
+    norm = np.linalg.norm(S) ; S = S[:keep]
+    if norm > 0: S = S * (norm / np.linalg.norm(S))
+    return U[:, :keep], S, Vh[:keep]
+
+
+def _split_sites(theta):
+    # splits the tensor theta (left bond, qudit, ..., qudit, right bond) into a chain of tensors
+    sites = []
+    while theta.ndim > 3:
+        l, d = theta.shape[:2]
+        U, S, Vh = _svd(theta.reshape(l * d, -1))
+        sites.append(U.reshape(l, d, -1))
+        theta = (S[:, None] * Vh).reshape((len(S),) + theta.shape[2:])
+    sites.append(theta)
+    return sites
+
+
+def _to_mps(psi):
+    # the chain of tensors of the state psi (a tensor with one axis for each qudit)
+    return _split_sites(psi.reshape((1,) + psi.shape + (1,))) if psi.ndim > 0 else []
+
+# ↑↑↑↑↑↑↑↑↑↑↑↑ Qmps class ↑↑↑↑↑↑↑↑↑↑↑↑ #
+
+
+
+
+# ↓↓↓↓↓↓↓↓↓↓↓↓ Qstab class ↓↓↓↓↓↓↓↓↓↓↓↓ #
+
+class Qstab(Qent):
+
+    # An entangled state of qubits reached with only Clifford gates, stored as its stabilizer generators:
+    # the i-th generator is the Pauli operator i^_tk[i] X^_tx[i] Z^_tz[i] (X and Z are applied on every qubit where the bit is 1).
+    # To keep also the global phase, it's stored the amplitude _amp of the basis state _x0 (never null),
+    # all the other amplitudes are derived by it. When a non-Clifford gate arrives it becomes a normal Qent
+
+    def __init__(self, qbits):
+        try:
+            qs_list = [] ; parts = [] ; amp = 1
+
+            for qs in qbits:
+                if qs in qs_list: continue
+                if isEnt(qs):
+                    ent = qs._ent
+                    parts.append((ent._tx, ent._tz, ent._tk, ent._x0)) ; amp *= ent._amp
+                    for q in list(ent._qbits):
+                        q._entangle(self, len(qs_list))
+                        qs_list.append(q)
+                else:
+                    x, z, k, x0, a = _stab_gen(qs._state)
+                    parts.append((np.array([[x]], np.uint8), np.array([[z]], np.uint8), np.array([k]), np.array([x0], np.uint8)))
+                    amp *= a
+                    qs._entangle(self, len(qs_list))
+                    qs_list.append(qs)
+
+            n = len(qs_list) ; i = 0
+            self._tx = np.zeros((n, n), np.uint8) ; self._tz = np.zeros((n, n), np.uint8)
+            for x, z, _, _ in parts: #the generators of the parts act on different qubits
+                l = len(x)
+                self._tx[i:i+l, i:i+l] = x ; self._tz[i:i+l, i:i+l] = z
+                i += l
+            self._tk = np.concatenate([p[2] for p in parts])
+            self._x0 = np.concatenate([p[3] for p in parts])
+            self._amp = amp
+            _Qstate.__init__(self, None, None, qs_list, 2**n)
+
+        except Exception as e:
+            raise InitializationError('Error to initialize the Qbits entangled', e)
+
+
+    @property
+    def _state(self):
+        # the complete vector: the amplitudes not null are the ones of x0 + (X parts of the stabilizers),
+        # every one is equal to _amp times the phase of the stabilizer that moves x0 there
+        x, z, k, _ = self._echelon()
+        n = len(self._qbits) ; r = len(x)
+        w = 1 << np.arange(n-1, -1, -1, dtype=np.int64)
+        x0 = self._x0.astype(np.int64)
+
+        e = np.arange(2**r, dtype=np.int64) #the bit j of e says if the j-th stabilizer is used
+        lin = (k + 2 * (z.astype(np.int64) @ x0)) % 4
+        M = (z.astype(np.int64) @ x.T.astype(np.int64)) % 2
+        idx = np.full(2**r, x0 @ w) ; ph = np.zeros(2**r, np.int64)
+        for l in range(r):
+            bit = (e >> l) & 1
+            mask = int(np.sum(M[:l, l] << np.arange(l, dtype=np.int64)))
+            ph += bit * (lin[l] + 2 * _parity(e & mask))
+            idx ^= bit * int(x[l].astype(np.int64) @ w)
+
+        psi = np.zeros(2**n, complex)
+        psi[idx] = self._amp * _I4[ph % 4]
+        return ket(psi)
+
+
+    @_state.setter
+    def _state(self, state):
+        if state is not None: self._fallback(state)
+
+
+    def _fallback(self, state = None):
+        # this state becomes a normal Qent with the complete vector
+        if state is None: state = self._state
+        for attr in ('_tx', '_tz', '_tk', '_x0', '_amp'): delattr(self, attr)
+        self.__class__ = Qent
+        self._state = state
+
+
+    @mutates
+    def apply(self, operator, pos=None):
+        ops = split_Op(self._qbits, operator, pos)
+        gates = [_clifford(op) for op, _ in ops]
+        if any(g is None for g in gates):
+            self._fallback()
+            return self.apply(operator, pos)
+
+        for (_, axes), (seq, phase) in zip(ops, gates):
+            for gate in seq:
+                getattr(self, gate[0])(*(axes[i] for i in gate[1:]))
+            self._amp *= phase
+
+
+    # every gate updates the stabilizers (U P U^H) and the amplitude of x0
+
+    def _H(self, q):
+        r = self._ratio(q)
+        a = (self._amp, self._amp * r) if self._x0[q] == 0 else (self._amp * r, self._amp)
+        new = (a[0] + (-1)**int(self._x0[q]) * a[1]) / np.sqrt(2)
+        if abs(new) < abs(self._amp) / 2: #x0 has no more amplitude, but x0 + e_q has it
+            new = (a[0] - (-1)**int(self._x0[q]) * a[1]) / np.sqrt(2)
+            self._x0[q] ^= 1
+        self._amp = new
+        x, z = self._tx[:, q].copy(), self._tz[:, q].copy()
+        self._tk = (self._tk + 2 * (x & z)) % 4
+        self._tx[:, q], self._tz[:, q] = z, x
+
+    def _S(self, q):
+        self._tk = (self._tk + self._tx[:, q]) % 4
+        self._tz[:, q] ^= self._tx[:, q]
+        if self._x0[q]: self._amp *= 1j
+
+    def _X(self, q):
+        self._tk = (self._tk + 2 * self._tz[:, q]) % 4
+        self._x0[q] ^= 1
+
+    def _Y(self, q):
+        self._tk = (self._tk + 2 * (self._tx[:, q] ^ self._tz[:, q])) % 4
+        self._amp *= 1j * (-1)**int(self._x0[q])
+        self._x0[q] ^= 1
+
+    def _Z(self, q):
+        self._tk = (self._tk + 2 * self._tx[:, q]) % 4
+        self._amp *= (-1)**int(self._x0[q])
+
+    def _CX(self, c, t):
+        self._tx[:, t] ^= self._tx[:, c]
+        self._tz[:, c] ^= self._tz[:, t]
+        self._x0[t] ^= self._x0[c]
+
+    def _CZ(self, a, b):
+        self._tk = (self._tk + 2 * (self._tx[:, a] & self._tx[:, b])) % 4
+        self._tz[:, a] ^= self._tx[:, b]
+        self._tz[:, b] ^= self._tx[:, a]
+        self._amp *= (-1)**int(self._x0[a] & self._x0[b])
+
+    def _SWAP(self, a, b):
+        self._tx[:, [a, b]] = self._tx[:, [b, a]] ; self._tz[:, [a, b]] = self._tz[:, [b, a]]
+        self._x0[[a, b]] = self._x0[[b, a]]
+
+
+    def _echelon(self):
+        # the stabilizers, multiplied each other, in reduced echelon form over their X parts
+        # (only the ones with X part not null) and the columns of the pivots
+        x, z, k = self._tx.copy(), self._tz.copy(), self._tk.copy()
+        r = 0 ; pivots = []
+        for col in range(x.shape[1]):
+            rows = np.flatnonzero(x[r:, col])
+            if len(rows) == 0: continue
+            p = rows[0] + r
+            x[[r, p]] = x[[p, r]] ; z[[r, p]] = z[[p, r]] ; k[[r, p]] = k[[p, r]]
+            others = np.flatnonzero(x[:, col]) ; others = others[others != r]
+            _mul(x, z, k, others, r)
+            pivots.append(col) ; r += 1
+        return x[:r], z[:r], k[:r], pivots
+
+
+    def _ratio(self, q):
+        # the ratio between the amplitudes of x0 + e_q and x0
+        x, z, k, pivots = self._echelon()
+        d = np.zeros(len(self._x0), np.uint8) ; d[q] = 1
+        acc = [np.zeros_like(d), np.zeros_like(d), 0]
+        for i, col in enumerate(pivots):
+            if d[col]:
+                acc[2] += k[i] + 2 * int(acc[1] @ x[i]) ; acc[0] ^= x[i] ; acc[1] ^= z[i]
+                d ^= x[i]
+        if d.any(): return 0
+        return _I4[(acc[2] + 2 * int(acc[1] @ self._x0)) % 4]
+
+
+    def _calc_p_state(self, pos):
+        if self._tx[:, pos].any(): return ket(np.sqrt(0.5), np.sqrt(0.5))
+        return ket(1, 0) if self._x0[pos] == 0 else ket(0, 1)
+
+
+    @mutates
+    def _measure(self, qs, basis, rng = None):
+        dims = [len(q) for q in qs]
+        if not (isinstance(basis, CanonBasis) or (isinstance(basis, KronBasis) and \
+           [len(b) for b in basis._pieces] == dims and all(isinstance(b, CanonBasis) for b in basis._pieces))):
+            self._fallback()
+            return self._measure(qs, basis, rng)
+
+        cols = [q._pos for q in qs]
+        if len(qs) == 1: #with the same probabilities of the dense vector
+            c = cols[0]
+            p = [0.5, 0.5] if self._tx[:, c].any() else [1 - self._x0[c], self._x0[c]]
+            bits = [_outcome(p, rng)]
+        else: #the outcomes are uniform on x0 + (X parts of the stabilizers), restricted to qs
+            bits = _uniform_pick(self._tx[:, cols], self._x0[cols], rng)
+
+        for q, m in zip(qs, bits):
+            self._project(q._pos, m)
+            self._detach_qubit(q, ket(1, 0) if m == 0 else ket(0, 1))
+        self._split()
+        return int(''.join(str(b) for b in bits), 2)
+
+
+    def _project(self, c, m):
+        # projects the qubit in position c in the state |m>
+        rows = np.flatnonzero(self._tx[:, c])
+        if len(rows) == 0: return #the outcome was certain
+        p = rows[0]
+        if self._x0[c] != m: #x0 is moved with the stabilizer p
+            self._amp *= _I4[(self._tk[p] + 2 * int(self._tz[p] @ self._x0)) % 4]
+            self._x0 ^= self._tx[p]
+        self._amp *= np.sqrt(2)
+        _mul(self._tx, self._tz, self._tk, rows[1:], p)
+        self._tx[p] = 0 ; self._tz[p] = 0 ; self._tz[p, c] = 1 ; self._tk[p] = 2 * m
+
+
+    def _detach_qubit(self, q, state):
+        # the qubit q (not entangled with the others) leaves this state with the state `state`
+        c = q._pos
+        rows = np.flatnonzero(self._tx[:, c] | self._tz[:, c])
+        _mul(self._tx, self._tz, self._tk, rows[1:], rows[0])
+        keep = np.arange(len(self._qbits)) != c ; gens = np.arange(len(self._qbits)) != rows[0]
+        self._amp /= _array(state).ravel()[self._x0[c]]
+        self._tx = self._tx[gens][:, keep] ; self._tz = self._tz[gens][:, keep]
+        self._tk = self._tk[gens] ; self._x0 = self._x0[keep]
+        self._qbits.pop(c) ; self._length //= 2
+        for pos in range(c, len(self._qbits)): self._qbits[pos]._entangle(self, pos)
+        q._disentangle(state)
+
+
+    def _split(self, groups=False):
+        # the qubits stabilized by a single qubit Pauli operator (i.e. not entangled) leave this state
+        # NB: the groups of qubits are not searched
+        n = len(self._qbits)
+        if n == 0: return
+        free = ~self._tx.any(0) | ~self._tz.any(0) | ~(self._tx ^ self._tz).any(0)
+        qs = [q for q, f in zip(self._qbits, free) if f]
+        if len(qs) == n: qs.pop()   # the last one is what remains
+
+        for q in qs:
+            c = q._pos ; r = self._ratio(c)
+            v = np.zeros(2, complex) ; v[self._x0[c]] = 1 ; v[1 - self._x0[c]] = r
+            self._detach_qubit(q, ket(v / np.linalg.norm(v) / _phase(v)))
+
+        if len(self._qbits) == 1:
+            q = self._qbits[0] ; r = self._ratio(0)
+            v = np.zeros(2, complex) ; v[self._x0[0]] = self._amp ; v[1 - self._x0[0]] = self._amp * r
+            q._disentangle(ket(v))
+
+
+
+_I4 = np.array([1, 1j, -1, -1j])
+
+_s2 = np.sqrt(0.5)
+_CLIFFORDS = [ #the Clifford gates recognized and how they are applied to a Qstab
+    (np.identity(2), []),
+    (np.array([[0, 1], [1, 0]]), [('_X', 0)]),
+    (np.array([[0, -1j], [1j, 0]]), [('_Y', 0)]),
+    (np.diag([1, -1]), [('_Z', 0)]),
+    (np.array([[_s2, _s2], [_s2, -_s2]]), [('_H', 0)]),
+    (np.diag([1, 1j]), [('_S', 0)]),
+    (np.diag([1, -1j]), [('_Z', 0), ('_S', 0)]),
+    (np.identity(4), []),
+    (np.identity(4)[[0, 1, 3, 2]], [('_CX', 0, 1)]),
+    (np.identity(4)[[0, 3, 2, 1]], [('_CX', 1, 0)]),
+    (np.identity(4)[[0, 2, 1, 3]], [('_SWAP', 0, 1)]),
+    (np.diag([1, 1, 1, -1]), [('_CZ', 0, 1)]),
+]
+
+
+def _clifford(op):
+    # the gates (and the global phase) of _CLIFFORDS equal to the operator `op`, None if there aren't
+    if len(op) not in (2, 4): return None
+    M = _array(op)
+    for G, seq in _CLIFFORDS:
+        if G.shape != M.shape: continue
+        i = np.unravel_index(np.argmax(np.abs(G)), G.shape)
+        phase = M[i] / G[i]
+        if np.isclose(abs(phase), 1) and np.allclose(M, phase * G):
+            return seq, phase
+    return None
+
+
+def _stab_gen(state):
+    # the stabilizer (x, z, k) of a qubit, its basis state x0 with the amplitude, None if it isn't a stabilizer state
+    if len(state) != 2: return None
+    a, b = _array(state).ravel()
+    if equal(b, 0): return 0, 1, 0, 0, a
+    if equal(a, 0): return 0, 1, 2, 1, b
+    for r, x, z, k in ((1, 1, 0, 0), (-1, 1, 0, 2), (1j, 1, 1, 1), (-1j, 1, 1, 3)):
+        if np.isclose(b / a, r): return x, z, k, 0, a
+    return None
+
+
+def _isStab(q):
+    return isinstance(q._ent, Qstab) if isEnt(q) else _stab_gen(q._state) is not None
+
+
+def _mul(x, z, k, rows, g):
+    # multiplies (in place) the Pauli operators in `rows` by the one in `g`
+    k[rows] = (k[rows] + k[g] + 2 * (z[rows].astype(np.int64) @ x[g])) % 4
+    x[rows] ^= x[g] ; z[rows] ^= z[g]
+
+
+def _parity(v):
+    # the parity of the bits of every integer in v
+    for s in (32, 16, 8, 4, 2, 1): v = v ^ (v >> s)
+    return v & 1
+
+
+def _uniform_pick(X, x0, rng = None):
+    # picks (like _outcome does with the same probabilities) one element of x0 + the span of the rows of X
+    X = X.copy() ; x0 = x0.copy() ; r = 0
+    for col in range(X.shape[1]):
+        rows = np.flatnonzero(X[r:, col])
+        if len(rows) == 0: continue
+        p = rows[0] + r
+        X[[r, p]] = X[[p, r]]
+        others = np.flatnonzero(X[:, col]) ; others = others[others != r]
+        X[others] ^= X[r]
+        if x0[col]: x0 ^= X[r] #the smallest element
+        r += 1
+    u = 1 - (what_rng() if rng is None else rng).random()
+    j = min(max(math.ceil(math.ldexp(u, r)) - 1, 0), 2**r - 1)
+    for i in range(r):
+        if (j >> (r - 1 - i)) & 1: x0 ^= X[i]
+    return list(x0)
+
+# ↑↑↑↑↑↑↑↑↑↑↑↑ Qstab class ↑↑↑↑↑↑↑↑↑↑↑↑ #
@@ -1,34 +1,98 @@
-from random import random, sample
+from hashlib import blake2b
 
 from .Qerrors import DimensionError, GenericLogiqError, InitializationError
-from .qtils import equal, isScalar, math, mod_square, np
+from .qtils import close, isScalar, math, mod_square, need_round, np, prod, round_values, what_precision, what_rng
 
 
 #### Qmath.py
 #
-# This file contains 2 classes that wrap the numpy.matrix class: the vector and the matrix class,
+# This file contains 2 classes that wrap a (2-D) numpy.ndarray: the vector and the matrix class,
 # it contains also other mathematical functions used in the classes.
 # (In the future, these 2 classes could be refactored and became the subclasses of a superclass "linobj")
 #
 ####
 
 
-# ↓↓↓↓↓↓↓↓↓↓↓↓ Add the npm() method to the np.matrix class ↓↓↓↓↓↓↓↓↓↓↓↓ #
-def _npm(self):
-    return self
+# ↓↓↓↓↓↓↓↓↓↓↓↓ numpy arrays ↓↓↓↓↓↓↓↓↓↓↓↓ #
 
-setattr(np.matrix, 'npm', _npm)
-# ↑↑↑↑↑↑↑↑↑↑↑↑ Add the npm() method to the np.matrix class ↑↑↑↑↑↑↑↑↑↑↑↑ #
+def _array(x):
+    # the numpy.ndarray of a vector, a matrix (or a numpy array), without copying it
+    if isinstance(x, vector): return x._a
+    if isinstance(x, matrix): return x.mtx
+    if isinstance(x, np.ndarray): return np.asarray(x)
+    return np.asarray(x.npm())
+
+
+def _array2d(a):
+    # the array `a` as a 2-D array (a single value or a 1-D array becomes a row, as numpy.matrix does)
+    if a.ndim < 2: return a.reshape(1, -1)
+    if a.ndim > 2: raise DimensionError('Too many dimensions ('+str(a.ndim)+'), only 2 are allowed')
+    return a
+
+
+def _frozen(a):
+    # the array `a` made read-only (e.g. because it's shared through the cache)
+    a.flags.writeable = False
+    return a
+
+# ↑↑↑↑↑↑↑↑↑↑↑↑ numpy arrays ↑↑↑↑↑↑↑↑↑↑↑↑ #
+
+
+
+# ↓↓↓↓↓↓↓↓↓↓↓↓ Content hash ↓↓↓↓↓↓↓↓↓↓↓↓ #
+# The hash is computed over the raw bytes of the values, rounded according to the current precision (and without -0),
+# so it's the same for the equal objects, in every process.
+# The exact hash (exact=True) uses the values as they are: it's the key of the values cached from an object,
+# that must not be shared by objects only close each other.
+# The square matrices with only one value in each row and column (the permutations with phases, e.g. the diagonal ones)
+# are hashed through their permutation and phases: so DiagOp and PermOp are hashed without building their matrices.
+# The other Kronecker products are hashed through the hashes of their pieces (see _kron_hash), so they have
+# a different hash from the equal dense matrices.
+
+def _canon(a, exact = False):
+    # the values of `a` in the canonical form used by the hash
+    a = np.asarray(a, complex)
+    return np.ascontiguousarray((a if exact else np.around(a, what_precision())) + 0)
+
+
+def _digest(tag, *arrays):
+    d = blake2b(tag, digest_size=8)
+    for a in arrays: d.update(np.ascontiguousarray(a).data)
+    return int.from_bytes(d.digest(), 'little', signed=True)
+
+
+def _perm_hash(src, phase, exact = False):
+    # the hash of the matrix M with M[i, src[i]] = phase[i] (and 0 elsewhere)
+    return _digest(b'P' if exact else b'p', np.asarray(src, np.int64), _canon(phase, exact))
+
+
+def _kron_hash(hashes, exact = False):
+    # the hash of a Kronecker product, from the hashes of its pieces
+    return _digest(b'K' if exact else b'k', np.array(hashes, np.int64))
+
+
+def _content_hash(a, exact = False):
+    "Returns the hash of the values of the array `a` (rounded according to the current precision, unless `exact`)"
+    a = _canon(a, exact)
+    if a.ndim == 2 and a.shape[0] == a.shape[1]:
+        nz = a != 0
+        if (nz.sum(axis=1) == 1).all():
+            src = nz.argmax(axis=1)
+            if (np.bincount(src, minlength=len(src)) == 1).all():
+                return _perm_hash(src, a[np.arange(len(src)), src], exact)
+    return _digest(b'D' if exact else b'd', np.array(a.shape, np.int64), a)
+
+# ↑↑↑↑↑↑↑↑↑↑↑↑ Content hash ↑↑↑↑↑↑↑↑↑↑↑↑ #
 
 
 
 # ↓↓↓↓↓↓↓↓↓↓↓↓ Kronecker product functions ↓↓↓↓↓↓↓↓↓↓↓↓ #
 
 def kron(m1, m2):
-    "Return the Kronecker product between `m1` and `m2`  \n(`m1` and `m2` must be `vector` or `matrix`, otherwise they can be a `np.matrix`)"
-    try: npm1 = m1.npm() ; npm2 = m2.npm()
+    "Return the Kronecker product between `m1` and `m2`  \n(`m1` and `m2` must be `vector` or `matrix`, otherwise they can be a numpy array)"
+    try: a1 = _array2d(_array(m1)) ; a2 = _array2d(_array(m2))
     except AttributeError: raise TypeError("The types of the inputs must be vector or matrix")
-    return select_type(np.kron(npm1, npm2))
+    return select_type(np.kron(a1, a2))
 
 
 def nkron(m, n):
@@ -36,31 +100,50 @@ def nkron(m, n):
     if n<1: return matrix((1)) #[[1]] @ x = x
     out = m
     for _ in range(n-1):
-        out = kron(out, m)
+        out = out @ m #(Op and Basis keep the Kronecker product factored)
     return out
 
 # ↑↑↑↑↑↑↑↑↑↑↑↑ Kronecker product functions ↑↑↑↑↑↑↑↑↑↑↑↑ #
 
 
+# ↓↓↓↓↓↓↓↓↓↓↓↓ Tensor contraction functions ↓↓↓↓↓↓↓↓↓↓↓↓ #
+
+def tensor_apply(M, v, dims, axes):
+    """
+    Apply the matrix `M` only to some qudits of the vector `v`, without building the complete operator
+
+    + `M`: the matrix to apply
+    + `v`: the vector, seen as a tensor with one axis for each qudit
+    + `dims`: the dimension of each qudit (i.e. the shape of the tensor)
+    + `axes`: the axes where `M` acts (in order), the product of their dimensions must be `len(M)`
+    """
+    if prod((dims[a] for a in axes)) != M.shape[0]:
+        raise DimensionError("The operator's dimension doesn't match the qudits where it acts")
+    psi = M._contract(_array(v).reshape(dims), list(axes))
+    return vector(psi.reshape(v.shape), no_cpy=True)
+
+# ↑↑↑↑↑↑↑↑↑↑↑↑ Tensor contraction functions ↑↑↑↑↑↑↑↑↑↑↑↑ #
+
+
 # ↓↓↓↓↓↓↓↓↓↓↓↓ Other useful functions ↓↓↓↓↓↓↓↓↓↓↓↓ #
 
 def select_type(item):
-    if len(item.shape) == 0:
-        return item
-    elif item.shape == (1,1):
-        return item[0,0]				#scalar
-    elif min(item.shape) == 1:
+    if item.ndim == 0:
+        return item[()]					#scalar
+    elif item.size == 1:
+        return item.flat[0]				#scalar
+    elif item.ndim == 1 or min(item.shape) == 1:
         return vector(item, no_cpy=True)#vector
     else:
         return matrix(item, no_cpy=True)#matrix
 
 
 class npmath:
-    # Methods to use, safely, standard operators between scalars, vector, matrix and numpy.matrix
+    # Methods to use, safely, standard operators between scalars, vector, matrix and numpy arrays
 
     @staticmethod
     def safe_npm(x):
-        try: return x if isScalar(x) else x.npm()
+        try: return x if isScalar(x) else _array2d(_array(x))
         except: raise TypeError("'"+str(type(x))+"' is an invalid type")
         
     @staticmethod
@@ -77,7 +160,7 @@ class npmath:
 
     @staticmethod
     def mul(x, y):
-        return npmath._fun(x, y, lambda x,y: x*y)
+        return npmath._fun(x, y, lambda x,y: x*y if isScalar(x) or isScalar(y) else x@y)
 
     @staticmethod
     def div(x, y):
@@ -86,39 +169,52 @@ class npmath:
     @staticmethod
     def equal(x, y):
         if isScalar(x) or isScalar(y): return x == y
-        try: x = x.npm() ; y = y.npm()
+        try: x = _array(x) ; y = _array(y)
         except: return False
         return npmath.np_equal(x, y)
 
     @staticmethod
     def np_equal(x, y):
-        if x.shape != y.shape: return False
-        for i in range(x.shape[0]):
-            for j in range(x.shape[1]):
-                if x[i,j] != y[i,j]: return False
-        return True
+        # (exactly equal, so equal objects have the same hash: to keep in mind the approximation errors use `equals()`)
+        return x.shape == y.shape and bool((x == y).all())
 
 # ↑↑↑↑↑↑↑↑↑↑↑↑ Other useful functions ↑↑↑↑↑↑↑↑↑↑↑↑ #
 
 
 
+# ↓↓↓↓↓↓↓↓↓↓↓↓ Random values ↓↓↓↓↓↓↓↓↓↓↓↓ #
+
+def rand_complex(shape):
+    # an array of random complex values (real and imaginary parts uniform in [-1, 1]), generated at once
+    re, im = what_rng().uniform(-1, 1, size=(2,) + tuple(shape))
+    return re + 1j*im
+
+# ↑↑↑↑↑↑↑↑↑↑↑↑ Random values ↑↑↑↑↑↑↑↑↑↑↑↑ #
+
+
+
 # ↓↓↓↓↓↓↓↓↓↓↓↓ vector class ↓↓↓↓↓↓↓↓↓↓↓↓ #
 
 class vector:
     """
-    + `v`: describes the value of this vector, it can be every kind of object allowed from `numpy.matrix` constructor, or another vector (in that case it will be copied)
+    + `v`: describes the value of this vector, it can be every kind of object allowed from `numpy.array` constructor (with one dimension or a single row/column), or another vector (in that case it will be copied)
     + `normalize` (optional): if True this vector will normalize (i.e. his norm became 1)
     + `values2round` (optional): a list where the value inside will be rounded for example if `values2round=[1]` and the vector is `[1.00001, 12.00001]` it becomes `[1, 12.00001]` (this according to the global precision)
+
+    The values are stored in a 2-D `numpy.ndarray` (a single row or a single column), with `no_cpy=True` it's shared with `v`
     """
 
+    __slots__ = ('_a',)
+
     def __init__(self, v, normalize = False, values2round = None, no_cpy = False):
         try:
-            if isinstance(v, (np.matrix, vector, matrix)):
-                self.vect = v.npm() if no_cpy else np.matrix(v.npm())
+            if isinstance(v, (np.ndarray, vector, matrix)):
+                v = _array(v)
+                self._a = _array2d(np.asarray(v, complex) if no_cpy else np.array(v, complex))
             else:
-                self.vect = np.matrix(v, complex)
+                self._a = _array2d(np.array(v, complex))
             
-            if min(self.vect.shape) != 1:
+            if min(self._a.shape) != 1:
                 raise DimensionError('A vector must be have only one dimension')
         
         except Exception as e:
@@ -130,44 +226,49 @@ class vector:
 
     def npm(self):
         """
-        Return the reference of the `numpy.matrix` associated
-        Watch out: it return the reference of the vector (for performance reason), so if you want to modify it first copy it.
+        Return a `numpy.matrix` view of this vector (for compatibility with the code that uses `numpy.matrix`).  
+        Watch out: it shares the data of the vector (for performance reason), so if you want to modify it first copy it.
         """
-        return self.vect
+        return self._a.view(np.matrix)
+
+
+    @property
+    def vect(self):
+        # (for compatibility) the numpy.matrix associated
+        return self.npm()
+
+
+    @property
+    def shape(self):
+        return self._a.shape
 
 
     def isRow(self):
         "`True` if the vector is a 'row vector'"
-        return self.vect.shape[0] == 1
+        return self._a.shape[0] == 1
     
 
     def isCol(self):
         "`True` if the vector is a 'column vector'"
-        return self.vect.shape[1] == 1
+        return self._a.shape[1] == 1
     
 
     def round_error(self, values):
         """Round the error (using `equals()`) of values in `values`.\n
         For example if `values = (0,1)` and this vector is `|5, 0.9999998>` it may became `|5, 1>`"""
-        for i in range(len(self)):
-            for v in values:
-                if equal(self[i], v):
-                    self[i] = v
-                elif equal(self[i].real, 0) or equal(self[i].imag, 0):
-                    self[i] = complex( 0 if equal(self[i].real, 0) else self[i].real, 0 if equal(self[i].imag, 0) else self[i].imag )
+        round_values(self._a, values, parts=True)
 
 
     def norm(self):
         "Return the norm of this vector, defined as `sqrt(<v|v>)`"
-        return math.sqrt(sum(mod_square(x) for x in self))
+        return math.sqrt(mod_square(self._a).sum())
         
 
     def normalize(self):
         "Normalize this vector (i.e. his norm became 1)"
         d = self.norm()
         if d==0: raise DimensionError("The null vector isn't normalizable")
-        for i in range(len(self)):
-            self[i] /= d
+        self._a /= d
         return self
 
 
@@ -176,37 +277,36 @@ class vector:
 
 
     def __neg__(self):
-        return vector(self.vect.__neg__(), no_cpy=True)
+        return vector(-self._a, no_cpy=True)
 
 
     def __len__(self):
-        return max(self.vect.shape)
+        return max(self._a.shape)
     
 
     def __getitem__(self, i):
         try:
-            item = self.vect[0, i] if self.isRow() else self.vect[i, 0]
-            return vector(item) if isinstance(i, slice) else item
+            if isinstance(i, slice): return vector(self._a[:, i] if self.isRow() else self._a[i, :])
+            return self._a[0, i] if self.isRow() else self._a[i, 0]
         except IndexError:
             raise IndexError("Index out of bound (i="+str(i)+" and vector's length = "+str(len(self))+")")
     
 
     def __setitem__(self, i, value):
         try:
-            if self.isRow(): self.vect[0, i] = value
-            else: self.vect[i, 0] = value
+            if self.isRow(): self._a[0, i] = value
+            else: self._a[i, 0] = value
         except IndexError:
             raise IndexError("Index out of bound (i="+str(i)+" and vector's length = "+str(len(self))+")")
     
 
     def _vector_op(self, v, fun):
-        #BUG: numpy.complex128 + v = np.array
         if isinstance(v, vector):
-            if v.vect.shape != self.vect.shape: raise DimensionError("The vector's lengths must be equal")
-            return vector(fun(self.vect, v.vect), no_cpy=True)
+            if v._a.shape != self._a.shape: raise DimensionError("The vector's lengths must be equal")
+            return vector(fun(self._a, v._a), no_cpy=True)
 
         elif isScalar(v):
-            return vector(fun(self.vect, v), no_cpy=True)
+            return vector(fun(self._a, v), no_cpy=True)
 
         else: raise TypeError('Other member must be a vector or a scalar')
         
@@ -241,22 +341,22 @@ class vector:
     
     def __mul__(self, v):
         npv = npmath.safe_npm(v)
-        return select_type(self.vect * npv)
+        return select_type(self._a * npv if isScalar(npv) else self._a @ npv)
     
 
     def __rmul__(self, v):
         npv = npmath.safe_npm(v)
-        return select_type(npv * self.vect)
+        return select_type(npv * self._a if isScalar(npv) else npv @ self._a)
     
 
     def __truediv__(self, v):
         npv = npmath.safe_npm(v)
-        return select_type(self.vect / npv)
+        return select_type(self._a / npv)
 
 
     def __rtruediv__(self, v):
         npv = npmath.safe_npm(v)
-        return select_type(npv / self.vect)
+        return select_type(npv / self._a)
     
 
     def __matmul__(self, v):
@@ -265,41 +365,40 @@ class vector:
     
 
     def __eq__(self, v):
-        if isinstance(v, (vector, matrix, np.matrix)):
-            return npmath.np_equal(self.vect, v.npm())
+        if isinstance(v, (vector, matrix, np.ndarray)):
+            return npmath.np_equal(self._a, _array(v))
         else:
             return False
 
 
     def __invert__(self): #conjugate transpose
-         return vector(self.vect.H)
+         return vector(self._a.conj().T)
     
 
     def transpose(self):
         "Transform this vector into its transpose"
-        self.vect = self.vect.T
+        self._a = self._a.T
     
     
     def conj(self):
         "Transform this vector into its conjugate transpose"
-        self.vect = self.vect.H
+        self._a = self._a.conj().T
 
 
     def __getattr__(self, name):
-        if name in 'tT': return vector(self.vect.T)
-        elif name in 'hH': return ~self
-        elif name == 'shape': return self.vect.shape
+        if name in ('t', 'T'): return vector(self._a.T)
+        elif name in ('h', 'H'): return ~self
         raise AttributeError("'vector' object has no attribute '"+name+"'")
     
 
     def __hash__(self):
-        return hash(str(self.vect))
+        return _content_hash(self._a)
 
 
     def __str__(self):
         braket = "<|>"
         i = self.isCol()
-        return braket[i] + "; ".join(str(self[i]) for i in range(len(self))) + braket[i+1]
+        return braket[i] + "; ".join(str(x) for x in self._a.ravel()) + braket[i+1]
         
 
     def __repr__(self):
@@ -309,8 +408,7 @@ class vector:
     @staticmethod
     def random(dim):
         "Return a random complex vector long `dim`"
-        rsign = lambda: sample((1,-1), 1)[0]
-        return vector([complex(rsign()*random(), rsign()*random()) for _ in range(dim)])
+        return vector(rand_complex((1, dim)), no_cpy=True)
 
 # ↑↑↑↑↑↑↑↑↑↑↑↑ vector class ↑↑↑↑↑↑↑↑↑↑↑↑ #
 
@@ -319,8 +417,8 @@ class vector:
 # ↓↓↓↓↓↓↓↓↓↓↓↓ Useful vector constructors ↓↓↓↓↓↓↓↓↓↓↓↓ #
 
 def roundedVector(v, values2round=(0,1,-1)):
-    "Generate a vector with the values in `values2round` rounded"
-    return vector(v, values2round=values2round)
+    "Generate a vector with the values in `values2round` rounded (unless the rounding policy is `'never'`)"
+    return vector(v, values2round=values2round if need_round(output=True) else None)
 
 
 
@@ -329,6 +427,8 @@ class ket(vector):
     
     Usage: `ket(x0, x1, ..., xn)`"""
 
+    __slots__ = ()
+
     def __init__(self, *values):
         if len(values) == 1: values = values[0]
         super().__init__(values)
@@ -343,6 +443,8 @@ class bra(vector):
     
     Usage: `bra(x0, x1, ..., xn)`"""
 
+    __slots__ = ()
+
     def __init__(self, *values):
         if len(values) == 1: values = values[0]
         super().__init__(values)
@@ -357,50 +459,69 @@ class bra(vector):
 
 class matrix:
     """
-    + `M`: describes the value of this vector, it can be every kind of object allowed to `numpy.matrix` constructor, or another matrix (in that case it will be copied)
+    + `M`: describes the value of this vector, it can be every kind of object allowed to `numpy.array` constructor (with at most 2 dimensions), or another matrix (in that case it will be copied)
     + `values2round` (optional): a list where the value inside will be rounded, for example if `values2round=[1]` and the matrix is `[[1.00001, 12.00001],[0.3,1.12]]` it becomes `[[1, 12.00001],[0.3,1.12]]` (this according to the global precision)
+
+    The values are stored in a 2-D `numpy.ndarray`, with `no_cpy=True` it's shared with `M`
     """
+
+    __slots__ = ('_mtx',)
     
     def __init__(self, M, values2round = None, no_cpy = False):
         try:
-            if isinstance(M, (np.matrix, matrix, vector)):
-                self.mtx = M.npm() if no_cpy else np.matrix(M.npm())
+            if isinstance(M, (np.ndarray, matrix, vector)):
+                M = _array(M)
+                self.mtx = _array2d(np.asarray(M, complex) if no_cpy else np.array(M, complex))
             else:
                 try:
                     if isinstance(M[0], ket):
                         M = [[M[j][i] for j in range(len(M))] for i in range(len(M[0]))]
                 except: pass
                 finally:
-                    self.mtx = np.matrix(M, complex)
+                    self.mtx = _array2d(np.array(M, complex))
         except Exception as e:
             raise InitializationError('Error to initialize the matrix', e)
 
         if values2round is not None: self.round_error(values2round)
 
 
+    @property
+    def mtx(self):
+        # the numpy.ndarray associated (some kinds of matrix build it only when it's needed, using `_dense()`)
+        if self._mtx is None: self._mtx = self._dense()
+        return self._mtx
+
+
+    @mtx.setter
+    def mtx(self, M):
+        self._mtx = M
+
+
     def round_error(self, values):
         """Round the error (using `equals()`) of values in `values`.  
         For example if `values = (0,1)` and this matrix is `[[5, 0.9999998],[-0.000001, 0.1]]` it may became `[[5, 1],[0, 0.1]]`"""
-        for i in range(self.shape[0]):
-            for j in range(self.shape[1]):
-                for v in values:
-                    if equal(self[i, j], v): self[i, j] = v
+        round_values(self.mtx, values)
 
 
     def isUnitary(self):
         "`True` if this matrix is unitary"
-        return self.mtx.shape[0] % self.mtx.shape[1] == 0 and np.allclose(np.eye(self.mtx.shape[0]), self.mtx.H * self.mtx)
+        M = self.mtx
+        return M.shape[0] % M.shape[1] == 0 and np.allclose(np.eye(M.shape[0]), M.conj().T @ M)
 
 
     def isOrthonormal(self):
         "`True` if this matrix is orthonormal"
         _, r = np.linalg.qr(self.mtx)
-        for i in range(len(self)):
-            for j in range(i, len(self)):
-                if i==j: continue
-                elif not equal(r[i,j], 0):
-                    return False
-        return True
+        n = len(self)
+        return bool(close(np.triu(r[:n, :n], 1), 0).all())
+
+
+    def _contract(self, psi, axes):
+        # applies this matrix to the tensor `psi`, contracting only the axes in `axes`
+        k = len(axes)
+        T = self.mtx.reshape([psi.shape[a] for a in axes]*2)
+        psi = np.tensordot(T, psi, axes=(list(range(k, 2*k)), axes))
+        return np.moveaxis(psi, list(range(k)), axes)
 
 
     def nomr(self):
@@ -415,10 +536,15 @@ class matrix:
 
     def npm(self):
         """
-        Return the reference of the `numpy.matrix` associated.  
-        Watch out: it return the reference of the matrix (for performance reason), so if you want to modify it first copy it.
+        Return a `numpy.matrix` view of this matrix (for compatibility with the code that uses `numpy.matrix`).  
+        Watch out: it shares the data of the matrix (for performance reason), so if you want to modify it first copy it.
         """
-        return self.mtx
+        return self.mtx.view(np.matrix)
+
+
+    @property
+    def shape(self):
+        return self.mtx.shape
 
 
     def __pos__(self):
@@ -426,22 +552,25 @@ class matrix:
 
 
     def __neg__(self):
-        return matrix(self.mtx.__neg__(), no_cpy=True)
+        return matrix(-self.mtx, no_cpy=True)
 
 
     def __getitem__(self, i):
         try:
-            return select_type(self.mtx[i])
+            return select_type(np.asarray(self.npm()[i])) # (indexed as a numpy.matrix, so a row or a column stays 2-D)
         except IndexError:
             raise IndexError("Index out of bound (request="+str(i)+", shape="+str(self.shape)+")")
 
 
     def __setitem__(self, i, value):
+        # (as numpy.matrix did, a vector fills a row or a column whatever its orientation)
+        if isinstance(value, (vector, matrix)): value = _array(value)
+        target = np.shape(self.mtx[i])
+        if isinstance(value, np.ndarray) and len(target) > 0 and value.size == prod(target): value = value.reshape(target)
         self.mtx[i] = value
     
 
     def _matrix_op(self, M, fun):
-        #BUG: numpy.complex128 + M = np.array
         if isinstance(M, matrix):
             if M.shape != self.shape: raise DimensionError("The matrices' shapes must be equal")
             return matrix(fun(self.mtx, M.mtx), no_cpy=True)
@@ -482,12 +611,12 @@ class matrix:
 
     def __mul__(self, M):
         npm = npmath.safe_npm(M)
-        return select_type(self.mtx * npm)
+        return select_type(self.mtx * npm if isScalar(npm) else self.mtx @ npm)
     
 
     def __rmul__(self, M):
         npm = npmath.safe_npm(M)
-        return select_type(npm * self.mtx)
+        return select_type(npm * self.mtx if isScalar(npm) else npm @ self.mtx)
     
 
     def __truediv__(self, M):
@@ -506,14 +635,14 @@ class matrix:
 
 
     def __eq__(self, M):
-        if isinstance(M, (vector, matrix, np.matrix)):
-            return npmath.np_equal(self.npm(), M.npm())
+        if isinstance(M, (vector, matrix, np.ndarray)):
+            return npmath.np_equal(self.mtx, _array(M))
         else:
             return False
 
 
     def __invert__(self):
-         return matrix(self.mtx.H)
+         return matrix(self.mtx.conj().T)
     
 
     def transpose(self):
@@ -523,18 +652,17 @@ class matrix:
 
     def conj(self):
         "Transform this matrix into its conjugate transpose"
-        self.mtx = self.mtx.H
+        self.mtx = self.mtx.conj().T
 
 
     def __getattr__(self, name):
-        if name in 'tT': return matrix(self.mtx.T)
-        elif name in 'hH': return ~self
-        elif name == 'shape': return self.mtx.shape
+        if name in ('t', 'T'): return matrix(self.mtx.T)
+        elif name in ('h', 'H'): return ~self
         raise AttributeError("'matrix' object has no attribute '"+name+"'")
 
 
     def __hash__(self):
-        return hash(str(self.mtx)) #fast hash
+        return _content_hash(self.mtx)
 
 
     def __str__(self):
@@ -572,15 +700,14 @@ class matrix:
     def random(shape):
         "Return a random complex matrix according to the given shape"
         if isinstance(shape, int): shape = (shape, shape)
-        rsign = lambda: sample((1,-1), 1)[0]
-        return matrix([[complex(rsign()*random(), rsign()*random()) for _ in range(shape[0])] for _ in range(shape[1])])
+        return matrix(rand_complex(shape), no_cpy=True)
 
 
     @staticmethod
     def rand_unitary(dim):
         # (from scipy)
-        random_state = np.random
-        z = 1/math.sqrt(2)*(random_state.normal(size=(dim, dim)) + 1j*random_state.normal(size=(dim, dim)))
+        re, im = what_rng().normal(size=(2, dim, dim))
+        z = 1/math.sqrt(2)*(re + 1j*im)
         q, r = np.linalg.qr(z)
         d = r.diagonal()
         q *= d/abs(d)
@@ -589,24 +716,11 @@ class matrix:
 
     @staticmethod
     def rand_orthonormal(dim):
-        # (from scipy)
-        random_state = np.random
-        H = np.eye(dim)
-        D = np.ones((dim,))
-        for n in range(1, dim):
-            x = random_state.normal(size=(dim-n+1,))
-            D[n-1] = np.sign(x[0])
-            x[0] -= D[n-1]*np.sqrt((x*x).sum())
-            # Householder transformation
-            Hx = (np.eye(dim-n+1) - 2.*np.outer(x, x)/(x*x).sum())
-            mat = np.eye(dim)
-            mat[n-1:, n-1:] = Hx
-            H = np.dot(H, mat)
-            # Fix the last sign such that the determinant is 1
-        D[-1] = (-1)**(1-(dim % 2))*D.prod()
-        # Equivalent to np.dot(np.diag(D), H) but faster, apparently
-        H = (D*H.T).T
-        return matrix(H, no_cpy=True)
+        # a random rotation (the Q of the QR decomposition of a gaussian matrix, with the determinant 1)
+        q, r = np.linalg.qr(what_rng().normal(size=(dim, dim)))
+        q *= np.sign(r.diagonal())
+        if np.linalg.det(q) < 0: q[:, 0] = -q[:, 0]
+        return matrix(q, no_cpy=True)
 
 
 # ↑↑↑↑↑↑↑↑↑↑↑↑ matrix class ↑↑↑↑↑↑↑↑↑↑↑↑ #
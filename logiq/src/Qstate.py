@@ -1,11 +1,9 @@
-from random import random, sample
-
 from .abs_Qstate import _Qstate
-from .Basis import Basis, CanonBasis, stdbasis
+from .Basis import Basis, CanonBasis
 from .Qbit import Qbit
 from .Qbits import Qbits
 from .Qerrors import IncomprehensibleStatusError, InitializationError
-from .Qmath import ket, vector
+from .Qmath import ket, rand_complex, vector
 from .qtils import STD_SYMBOLS, isScalar, states2list, str2states
 
 
@@ -54,8 +52,7 @@ class Qstate(_Qstate):
             n = len(b)
         else:
             b = CanonBasis(n)
-        rsign = lambda: sample((1,-1), 1)[0]
-        return Qbit(ket([complex(rsign()*random(), rsign()*random()) for _ in range(n)]), b, normalize=True)
+        return Qbit(ket(rand_complex((n,))), b, normalize=True)
 
 
     @staticmethod
@@ -74,7 +71,8 @@ class Qstate(_Qstate):
         try:
             state = str2states(s)
             if basis is None:
-                if all((b in stdbasis.symbols for b in state)):
+                if all((b in STD_SYMBOLS[:2] for b in state)):
+                    from .Basis import stdbasis #(created only when it's needed)
                     basis = stdbasis
                 elif all((b in STD_SYMBOLS for b in state)):
                     basis = CanonBasis(STD_SYMBOLS.find(max(state.keys()))+1)
@@ -0,0 +1,222 @@
+from .abs_Qstate import _outcomes, _Qstate, need_norm, unreal
+from .Basis import CanonBasis, KronBasis
+from .Qbits import split_Op
+from .Qerrors import DimensionError, IllegalOperationError, InitializationError
+from .Qmath import _array, np
+from .qtils import Vdigit, equal, make_rng, need_round, prod, round_values, val2str
+
+
+#### StateBatch.py
+#
+# This file contains the StateBatch class:
+# many quantum states with the same layout (the same qudits) stored as a single array,
+# so the same circuit is applied to all of them at once
+#
+####
+
+
+# ↓↓↓↓↓↓↓↓↓↓↓↓ StateBatch class ↓↓↓↓↓↓↓↓↓↓↓↓ #
+
+class StateBatch:
+    """
+    A batch of quantum states with the same layout (one row for each state)
+
+    + `states`: a list of quantum states (Qbit or Qbits with the same qudits) or a matrix B×d (every row is a state)
+    + `dims` (optional): the dimensions of the qudits of every state (only if `states` is a matrix, by default a single qudit)
+    + `basis` (optional): the basis of the states, it serves to measure them and to represent them
+    + `normalize` (optional): if True the states will be normalized
+
+    `Op | batch` applies the operator to all the states, as it was applied to a Qbits;
+    `batch[i]` (or `batch[list of indexes]`) are the i-th qudits of all the states
+    """
+
+    _rng = None #the random number generator of this batch (None means the logiq one)
+
+    def __init__(self, states, dims = None, basis = None, normalize = None):
+        try:
+            bases = None
+            if isinstance(states, (list, tuple)) and len(states) > 0 and isinstance(states[0], _Qstate):
+                qs = states[0]._qbits
+                dims = [len(q) for q in qs] ; bases = [q._basis for q in qs]
+                if basis is None: basis = states[0]._basis
+                if any([len(q) for q in s._qbits] != dims for s in states):
+                    raise DimensionError('The states of a StateBatch must have the same qudits')
+                states = [_array(s._getState()).ravel() for s in states]
+
+            data = np.array(states, complex)
+            if data.ndim != 2: raise DimensionError('The states of a StateBatch must be a matrix B×d')
+            if dims is None: dims = [data.shape[1]]
+            if prod(dims) != data.shape[1]:
+                raise DimensionError("The dimensions of the qudits don't match the states")
+
+            norms = np.linalg.norm(data, axis=1)
+            if not np.allclose(norms, 1):
+                if (normalize is None and need_norm()) or normalize:
+                    if not norms.all(): raise DimensionError("The null vector isn't normalizable")
+                    data /= norms[:, None]
+                else:
+                    raise IllegalOperationError('A quantum state must have norm 1')
+
+            self._data = data
+            self._dims = list(dims)
+            self._bases = [CanonBasis(d) for d in dims] if bases is None else bases
+            self._root = self
+            self._axes = list(range(len(dims)))
+            if basis is None and len(dims) == 1: basis = self._bases[0]
+            if basis is not None and len(basis) != data.shape[1]:
+                raise ValueError('Lengths of states and basis must be equal')
+            self._basis = basis
+
+        except Exception as e:
+            raise InitializationError('Error to initialize the StateBatch', e)
+
+
+    def _sub(self, axes):
+        # the qudits `axes` (of the root batch) of all the states
+        batch = StateBatch.__new__(StateBatch)
+        root = batch._root = self._root
+        batch._axes = axes
+        batch._dims = [root._dims[a] for a in axes]
+        batch._bases = [root._bases[a] for a in axes]
+        batch._basis = batch._bases[0] if len(axes) == 1 else None
+        return batch
+
+
+    def _tensor(self):
+        # all the states as a tensor, with the first axis for the states and one for each qudit
+        root = self._root
+        return root._data.reshape([len(root._data)] + root._dims)
+
+
+    @property
+    @unreal
+    def states(self):
+        "The complete states (a matrix B×d, every row is a state)"
+        return self._root._data.copy()
+
+
+    @property
+    def basis(self):
+        return self._basis
+
+
+    @property
+    def spaces(self):
+        "Return the number of qudits of every state"
+        return len(self._dims)
+
+
+    def setBasis(self, basis):
+        "Set the default basis for these states"
+        if basis is not None and len(basis) != prod(self._dims):
+            raise ValueError('Lengths of states and basis must be equal')
+        self._basis = basis
+
+
+    def setRng(self, seed = None):
+        "Set the random number generator used to measure these states (see `set_rng`), `None` means the one of logiq"
+        self._root._rng = None if seed is None else make_rng(seed)
+
+
+    def apply(self, operator, pos = None):
+        "Apply an operator to all the states (the positions `pos` are the same used by Qbits)"
+        root = self._root
+        psi = self._tensor()
+        for op, axes in split_Op([range(d) for d in self._dims], operator, pos): # NB: split_Op needs only the lengths
+            psi = op._contract(psi, [self._axes[a] + 1 for a in axes])
+        data = psi.reshape(root._data.shape)
+        if need_round(): round_values(data, (0,1), parts=True)
+        root._data = data
+
+
+    def apply2all(self, op):
+        "Apply the operator to all the qudits of these states"
+        for i in range(self.spaces): self.apply(op, [i])
+
+
+    def _measureBasis(self, basis):
+        if basis is None and self._basis is None: return KronBasis(self._bases)
+        return _Qstate._measureBasis(self, basis)
+
+
+    def _coeffs(self, basis):
+        # the states with the measured qudits in the first axis (after the states one), in `basis` (as Basis.transform does),
+        # and the other qudits in the last axis
+        psi = np.moveaxis(self._tensor(), [a + 1 for a in self._axes], range(1, len(self._axes) + 1))
+        psi = psi.reshape(len(psi), prod(self._dims), -1)
+        if isinstance(basis, CanonBasis) or (isinstance(basis, KronBasis) and all(isinstance(b, CanonBasis) for b in basis._pieces)):
+            return psi
+        return np.einsum('ij,bjr->bir', _array(basis), psi)
+
+
+    def measure(self, basis = None):
+        """
+        Measure (these qudits of) all the states in Basis `basis`,
+        the result will be the array of the eigenvalues associated
+        """
+        basis = self._measureBasis(basis)
+        if len(basis) != prod(self._dims):
+            raise DimensionError("The basis' dimension doesn't match the qudits to measure")
+        c = self._coeffs(basis)
+        p = (c * c.conj()).real.sum(axis=2)
+        i = _outcomes(p, self._root._rng)
+
+        # every state collapses: the measured qudits in the eigenstate, the others keep the (rescaled) slice of the outcome
+        b = np.arange(len(c))
+        rest = c[b, i] / np.sqrt(p[b, i])[:, None]
+        psi = _array(basis).T[i][:, :, None] * rest[:, None, :]
+        root = self._root ; k = len(self._axes)
+        others = [d for a, d in enumerate(root._dims) if a not in self._axes]
+        psi = np.moveaxis(psi.reshape([len(psi)] + self._dims + others), range(1, k + 1), [a + 1 for a in self._axes])
+        root._data = psi.reshape(root._data.shape)
+
+        return np.asarray(basis.ew)[i]
+
+
+    @unreal
+    def probs(self, basis = None):
+        "Returns the probabilities to measure each state of `basis` (a matrix B×d, a row for every state)"
+        if basis is None: basis = self._measureBasis(None)
+        c = self._coeffs(basis)
+        return (c * c.conj()).real.sum(axis=2)
+
+
+    @unreal
+    def prob(self, i, basis = None):
+        "Returns the probabilities (one for every state) to measure the `i`-th state if the basis `basis` is used"
+        return self.probs(basis)[:, i]
+
+
+    def __getitem__(self, i):
+        axes = self._axes[i] if isinstance(i, slice) else [self._axes[j] for j in i] if isinstance(i, (list, tuple)) else [self._axes[i]]
+        return self._sub(axes)
+
+
+    def __len__(self):
+        return len(self._root._data)
+
+
+    @unreal
+    def printAs(self, basis):
+        "Returns the representation of every state from the 'point of view' of `basis` (a line for each state)"
+        if self is not self._root:
+            raise IllegalOperationError('Only the complete states can be represented')
+        if basis is None:
+            basis = KronBasis(self._bases)
+            symb = [str(s) for s in Vdigit([b.symbols for b in self._bases])]
+        else:
+            symb = basis.symbols
+        lines = []
+        for row in self._coeffs(basis)[:, :, 0]:
+            lines.append(' '.join(val2str(x) + '|' + symb[j] + '>' for j, x in enumerate(row) if not equal(x, 0)))
+        return '\n'.join(lines)
+
+
+    def __str__(self):
+        return self.printAs(self._basis)
+
+
+    def __repr__(self):
+        return '<StateBatch @ '+hex(id(self))+', '+str(len(self))+' states of '+str(self.spaces)+' qudits>'
+
+# ↑↑↑↑↑↑↑↑↑↑↑↑ StateBatch class ↑↑↑↑↑↑↑↑↑↑↑↑ #
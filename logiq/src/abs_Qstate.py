@@ -1,15 +1,17 @@
-from random import random
+from functools import wraps
 
 from .Basis import Basis
 from .Operator import Op
 from .Qerrors import IllegalOperationError, NotAllowError
-from .Qmath import mod_square, vector
+from .Qmath import _array, np, vector
+from .qtils import make_rng, need_round, what_rng
 
 
 #### abs_Qstate.py
 #
 # This file contains the abstract class for Qstate
 # and the functions to manage the auto-normalization and the cheating permissions
+# (and to know when the quantum states change, so the values computed from them can be kept until then)
 #
 ####
 
@@ -53,12 +55,59 @@ def unreal(func):
 
 
 
+# ↓↓↓↓↓↓↓↓↓↓↓↓ State changes ↓↓↓↓↓↓↓↓↓↓↓↓ #
+
+_version = 0 #incremented every time a quantum state changes (an operator is applied or it's measured)
+
+
+def mutates(func):
+    # the methods it decorates change a quantum state: the values computed from the states before are no more valid
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        global _version
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _version += 1
+    return wrapper
+
+
+def states_version():
+    # two equal values mean that no quantum state has changed in between
+    return _version
+
+# ↑↑↑↑↑↑↑↑↑↑↑↑ State changes ↑↑↑↑↑↑↑↑↑↑↑↑ #
+
+
+
+# ↓↓↓↓↓↓↓↓↓↓↓↓ Measurement functions ↓↓↓↓↓↓↓↓↓↓↓↓ #
+
+def _outcome(p, rng = None):
+    # picks the index of the outcome of a measurement, given the probabilities `p` (even not normalized),
+    # using the generator `rng` (by default the logiq one)
+    c = np.cumsum(p)
+    u = 1 - (what_rng() if rng is None else rng).random()
+    return min(int(np.searchsorted(c, u * c[-1])), len(c) - 1)
+
+
+def _outcomes(p, rng = None):
+    # the same of _outcome for many measurements at once: `p` is a matrix with a row of probabilities for each one
+    c = np.cumsum(p, axis=1)
+    u = (1 - (what_rng() if rng is None else rng).random(len(c))) * c[:, -1]
+    return np.minimum((c < u[:, None]).sum(axis=1), c.shape[1] - 1)
+
+# ↑↑↑↑↑↑↑↑↑↑↑↑ Measurement functions ↑↑↑↑↑↑↑↑↑↑↑↑ #
+
+
+
 # ↓↓↓↓↓↓↓↓↓↓↓↓ _Qstate class ↓↓↓↓↓↓↓↓↓↓↓↓ #
 
 
 class _Qstate:
     # Abstract class for Qstate
 
+    _rng = None #the random number generator of this state (None means the logiq one)
+
     def __init__(self, state, basis, qbits, length):
         self._state = state
         self._basis = basis
@@ -96,10 +145,19 @@ class _Qstate:
         pass
     
 
+    def setRng(self, seed = None):
+        """
+        Set the random number generator used to measure this quantum state (see `set_rng`),
+        `None` means the one of logiq
+        """
+        self._rng = None if seed is None else make_rng(seed)
+
+
+    @mutates
     def apply(self, op, pos=None):
         "Apply an operator to this quantum state"
         self._state = op * self._state
-        self._state.round_error((0,1))
+        if need_round(): self._state.round_error((0,1))
 
 
     def apply2all(self, op):
@@ -108,18 +166,40 @@ class _Qstate:
             q.apply(op)
 
 
-    def measure(self, basis = None):
-        "Measure this state in Basis `basis`, the result will be the eigenvalue associated"
+    def _measureBasis(self, basis):
+        # the basis to use for a measurement
         if basis is None:
             if self._basis is None: raise IllegalOperationError('Measurement basis required')
             basis = self._basis
+        return basis
+
+
+    def measure(self, basis = None):
+        "Measure this state in Basis `basis`, the result will be the eigenvalue associated"
+        basis = self._measureBasis(basis)
         state = basis.transform(self._getState())
-        r = random()
-        i = -1 ; s = 1
-        while s > r:
-            i += 1
-            s -= mod_square(state[i])
-        return i, state, basis
+        p = _array(state).ravel()
+        return _outcome((p * p.conj()).real, self._rng), state, basis
+
+
+    def _probs(self, basis):
+        # returns the probabilities to measure each state of `basis` and the symbols of these states
+        if basis is None: basis = self._basis
+        if basis is None: raise IllegalOperationError('Need a basis to calculate the probabilities')
+        state = _array(basis.transform(self._getState())).ravel()
+        return (state * state.conj()).real, basis.symbols
+
+
+    @unreal
+    def sample(self, shots, basis = None):
+        """
+        Simulates `shots` measurements using basis `basis`, without collapsing this quantum state
+
+        Returns a dictionary {symbol : times measured} (the states never measured are omitted)
+        """
+        p, symbols = self._probs(basis)
+        counts = (what_rng() if self._rng is None else self._rng).multinomial(shots, p/p.sum())
+        return {symbols[i]: int(counts[i]) for i in np.flatnonzero(counts)}
 
 
     @unreal
@@ -127,8 +207,8 @@ class _Qstate:
         "Returns the probability to measure the `i`-th state if the basis `basis` is used"
         if basis is None: basis = self._basis
         if basis is None: raise IllegalOperationError('Need a basis to calculate the probabilities')
-        M = (basis[i] * ~basis[i])
-        return ~self._getState() * (~M * M) * self._getState()
+        p = ~basis[i] * self._getState() #(<b|M^H M|s> = |<b|s>|^2, where M is the projector |b><b|)
+        return (p * p.conjugate()).real
 
 
     @unreal
@@ -0,0 +1,75 @@
+import os
+import random
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from .abs_Qstate import _Qstate
+from .Qmath import np
+from .qtils import set_rng, what_rng
+
+
+#### parallel.py
+#
+# This file contains the run_many function, to run many independent simulations
+# (e.g. many shots of an algorithm) in parallel, on a pool of processes
+#
+####
+
+
+# the runs are divided in (at most) this number of chunks, each one with its own random stream:
+# so the results depend only on the seed, not on the number of workers
+N_CHUNKS = 64
+
+
+def run_many(fn, n, workers = None, seed = None):
+    """
+    Runs `n` times the function `fn` (without arguments) on a pool of processes
+    and returns a dictionary {result : times obtained}
+
+    + `fn`: the function to run, it must be defined at the top level of a module (to be sent to the processes)
+    + `n`: how many times `fn` is run
+    + `workers` (optional): the number of processes (by default the number of CPUs, with 1 everything runs in this process)
+    + `seed` (optional): the seed of the random numbers, the same seed gives the same results
+
+    Only the results go back from the processes: if `fn` returns a quantum state, its representation (a string) is used.
+    NB: on the systems that don't fork the processes (e.g. Windows and macOS) `run_many` must be called under `if __name__ == '__main__':`
+    """
+    if n < 0: raise ValueError('The number of runs must be greater or equal to 0')
+    if workers is None: workers = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+    if workers < 1: raise ValueError('The number of workers must be at least 1')
+
+    k = max(min(n, N_CHUNKS), 1)
+    sizes = [n // k + (1 if i < n % k else 0) for i in range(k)]
+    tasks = [(fn, size, ss) for size, ss in zip(sizes, np.random.SeedSequence(seed).spawn(k))]
+
+    counts = Counter()
+    if workers == 1:
+        states = random.getstate(), np.random.get_state(), what_rng()
+        try:
+            for task in tasks: counts.update(_run_chunk(task))
+        finally:
+            random.setstate(states[0]) ; np.random.set_state(states[1]) ; set_rng(states[2])
+    else:
+        with ProcessPoolExecutor(workers) as ex:
+            for c in ex.map(_run_chunk, tasks): counts.update(c)
+
+    return dict(counts)
+
+
+def _run_chunk(task):
+    # runs a chunk of simulations, with its random stream (for logiq and for the random modules used by `fn`), and counts the results
+    fn, size, ss = task
+    ss_logiq, ss_random, ss_np = ss.spawn(3) #(independent streams for the three generators)
+    set_rng(ss_logiq)
+    random.seed(int(ss_random.generate_state(1, np.uint64)[0]))
+    np.random.seed(ss_np.generate_state(4))
+    return Counter(_result(fn()) for _ in range(size))
+
+
+def _result(r):
+    # the result of a run, as a (hashable and light) value
+    if isinstance(r, _Qstate): return str(r)
+    if isinstance(r, np.ndarray): return tuple(r.tolist())
+    if isinstance(r, list): return tuple(_result(x) for x in r)
+    if isinstance(r, np.generic): return r.item()
+    return r
@@ -1,6 +1,6 @@
 import math
 import re
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 from numbers import Complex
 
 import numpy as np
@@ -12,6 +12,8 @@ import numpy as np
 # - to manage the precision and provide functions that kepp in mind it
 # - to formatting the qtrings of qubit representation
 # - the Vdigit class
+# - the random number generator
+# - the cache of the values computed from the operators and the bases
 # - other
 #
 ####
@@ -52,10 +54,183 @@ def what_precision():
     "Returns the current precision"
     return current_prec
 
+
+ROUNDING_POLICIES = ('always', 'output', 'never')
+current_rounding = 'always'
+
+
+def set_rounding(policy = None):
+    """
+    Set when the approximation errors are rounded:
+    + `'always'` (default): after every operator applied and every time a state is measured or represented
+    + `'output'`: only when a state is measured or represented
+    + `'never'`: the values are never rounded
+    """
+    global current_rounding
+    if policy is None: current_rounding = 'always'
+    elif policy in ROUNDING_POLICIES:
+        current_rounding = policy
+    else:
+        raise ValueError('The rounding policy must be one of '+str(ROUNDING_POLICIES))
+
+
+def what_rounding():
+    "Returns the current rounding policy"
+    return current_rounding
+
+
+def need_round(output = False):
+    # True if the values must be rounded according to the current policy (`output` is True for measurements and representations)
+    return current_rounding == 'always' or (output and current_rounding == 'output')
+
+
+current_validation = True
+
+
+def set_validation(value = True):
+    """
+    If `False`, the operators and the bases aren't validated (i.e. checked to be unitary/orthonormal) when they are created.  
+    NB: the operators and the bases derived from other (valid) ones are never validated again
+    """
+    global current_validation
+    current_validation = bool(value)
+
+
+def what_validation():
+    "Returns `True` if operators and bases are validated when they are created"
+    return current_validation
+
 # ↑↑↑↑↑↑↑↑↑↑↑↑ Precision ↑↑↑↑↑↑↑↑↑↑↑↑ #
 
 
 
+# ↓↓↓↓↓↓↓↓↓↓↓↓ Backend ↓↓↓↓↓↓↓↓↓↓↓↓ #
+
+BACKENDS = ('dense', 'mps')
+current_backend = 'dense'
+current_mps = (None, 1e-12)
+
+
+def set_backend(backend = None, max_bond = None, cutoff = 1e-12):
+    """
+    Set how the new entangled states are stored:
+    + `'dense'` (default): a single vector with all the amplitudes
+    + `'mps'`: a Matrix Product State, i.e. a chain of small tensors (one for each qudit), good for many qudits with a limited entanglement
+
+    Only for `'mps'`:
+    + `max_bond` (optional): the maximum bond dimension kept between two qudits (`None` means no limit)
+    + `cutoff` (optional): the singular values smaller than `cutoff` (relative to the biggest one) are discarded
+    """
+    global current_backend, current_mps
+    if backend is None: backend = 'dense'
+    if backend not in BACKENDS:
+        raise ValueError('The backend must be one of '+str(BACKENDS))
+    if max_bond is not None and max_bond < 1:
+        raise ValueError('The maximum bond dimension must be at least 1')
+    current_backend = backend
+    current_mps = (max_bond, cutoff)
+
+
+def what_backend():
+    "Returns the current backend"
+    return current_backend
+
+
+def what_mps():
+    "Returns the maximum bond dimension and the cutoff used by the 'mps' backend"
+    return current_mps
+
+# ↑↑↑↑↑↑↑↑↑↑↑↑ Backend ↑↑↑↑↑↑↑↑↑↑↑↑ #
+
+
+
+# ↓↓↓↓↓↓↓↓↓↓↓↓ Random numbers ↓↓↓↓↓↓↓↓↓↓↓↓ #
+
+current_rng = None #(created the first time it's needed, so numpy.random is imported only if it's used)
+
+
+def make_rng(seed = None):
+    # a numpy Generator from `seed` (an int, a SeedSequence or a Generator, that is returned as it is)
+    return seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+
+
+def set_rng(seed = None):
+    """
+    Set the random number generator used by logiq (to measure and to create random objects):
+    `seed` can be an int, a `numpy.random.SeedSequence` or a `numpy.random.Generator` (`None` means a new unpredictable one)
+    """
+    global current_rng
+    current_rng = make_rng(seed)
+
+
+def what_rng():
+    "Returns the random number generator used by logiq (a `numpy.random.Generator`)"
+    global current_rng
+    if current_rng is None: current_rng = np.random.default_rng()
+    return current_rng
+
+# ↑↑↑↑↑↑↑↑↑↑↑↑ Random numbers ↑↑↑↑↑↑↑↑↑↑↑↑ #
+
+
+
+# ↓↓↓↓↓↓↓↓↓↓↓↓ Cache ↓↓↓↓↓↓↓↓↓↓↓↓ #
+
+current_cache_size = 256
+
+
+class _LRU:
+    # a cache that keeps only the `current_cache_size` values used most recently
+
+    def __init__(self):
+        self._d = OrderedDict()
+
+
+    def get(self, key, compute):
+        "Returns the value of `key`, computing it with `compute()` (and storing it) if it isn't in the cache"
+        try:
+            self._d.move_to_end(key)
+            return self._d[key]
+        except KeyError: pass
+        value = compute()
+        if current_cache_size > 0:
+            self._d[key] = value
+            while len(self._d) > current_cache_size: self._d.popitem(last=False)
+        return value
+
+
+    def clear(self):
+        self._d.clear()
+
+
+    def __len__(self):
+        return len(self._d)
+
+
+# the values computed from the operators and the bases (the adjoints, isUnitary, the eigenvalues and the Kronecker products),
+# the keys are their exact content hashes (the values, not rounded)
+memo = _LRU()
+
+
+def set_cache_size(size = None):
+    """
+    Set how many values computed from the operators and the bases (e.g. the adjoints and the eigenvalues) are kept
+    to be used again by the equal objects (`None` means the default, 256, and 0 disables the cache)
+    """
+    global current_cache_size
+    if size is None: size = 256
+    if size < 0: raise ValueError('The size of the cache must be greater or equal to 0')
+    current_cache_size = size
+    while len(memo._d) > size: memo._d.popitem(last=False)
+
+
+def what_cache_size():
+    "Returns how many values computed from the operators and the bases are kept"
+    return current_cache_size
+
+# ↑↑↑↑↑↑↑↑↑↑↑↑ Cache ↑↑↑↑↑↑↑↑↑↑↑↑ #
+
+
+
 # ↓↓↓↓↓↓↓↓↓↓↓↓ Necessary mathematic functions ↓↓↓↓↓↓↓↓↓↓↓↓ #
 
 def mod_square(c):
@@ -63,20 +238,53 @@ def mod_square(c):
     return (c * c.conjugate()).real
 
 
-def equal(n1, n2, precision=current_prec):
-    "Check if 2 complex numbers are equal, keeping in mind possible error of approximation."
+def equal(n1, n2, precision=None):
+    """
+    Check if 2 complex numbers are equal, keeping in mind possible error of approximation (by default according to the current precision).  
+    With numpy arrays the check is done element by element
+    """
+    if precision is None: precision = current_prec
     return np.around(n1, precision) == np.around(n2, precision)
 
 
-def equals(v1, v2):
-    "Check if 2 linear objects are equal, keeping in mind possible error of approximation"
-    try: npm1 = v1.npm() ; npm2 = v2.npm()
+def close(a1, a2):
+    # element by element, True where the values differ less than the current precision
+    # (unlike `equal()` the values near a rounding boundary aren't split, e.g. 0.4999999999999999 and 0.5)
+    return np.abs(np.subtract(a1, a2)) <= 10.0**-current_prec
+
+
+def round_values(a, values, parts = False):
+    """
+    Round, in place, the elements of the array `a` equal (according to the current precision) to one of `values`.  
+    If `parts` is True also the real and imaginary parts equal to 0 are rounded
+    """
+    a = np.asarray(a)
+    r = np.around(a, current_prec)
+    for v in values:
+        a[r == np.around(v, current_prec)] = v
+    if parts and np.iscomplexobj(a):
+        a.real[np.around(a.real, current_prec) == 0] = 0
+        a.imag[np.around(a.imag, current_prec) == 0] = 0
+
+
+def equals(v1, v2, batch = False):
+    """
+    Check if 2 linear objects (or numpy arrays) are equal, keeping in mind possible error of approximation (according to the current precision)
+
+    + `batch` (optional): if True `v1` and `v2` are arrays of objects (along the first axis),
+    and the result is an array with the check for each couple (all False if the shapes are different)
+    """
+    try: a1 = _asarray(v1) ; a2 = _asarray(v2)
     except AttributeError: return v1 == v2
-    if npm1.shape != npm2.shape: return False
-    for i in range(npm1.shape[0]):
-        for j in range(npm1.shape[1]):
-            if not equal(npm1[i,j], npm2[i,j]): return False
-    return True
+    if a1.shape != a2.shape:
+        return np.zeros(max(len(a1), len(a2)), bool) if batch else False
+    eq = close(a1, a2)
+    return eq.reshape(len(eq), -1).all(axis=1) if batch else bool(eq.all())
+
+
+def _asarray(x):
+    # the numpy array of a linear object (or of a numpy array)
+    return np.asarray(x) if isinstance(x, np.ndarray) else np.asarray(x.npm())
 
 
 def isScalar(var):
@@ -236,24 +444,6 @@ class Vdigit: # Variable Base digits
             self.__pp(i-1)
 
 
-    def _pp_ent(self, i, j, x):
-        # custom method used to swap an entanged state
-        if x < 0:
-            self.hasNext = False
-            return
-        elif x in (i,j):
-            x -= 1
-        else:
-            self.ds[x] += 1
-            if self.ds[x] >= self.dim(x):
-                self.ds[x]=0
-                x -= 1
-            else:
-                return
-
-        self._pp_ent(i,j,x)
-
-
     def pp(self):
         """
         The "plus plus" method: do a "+1" to the value of this Vdigit
@@ -276,6 +466,11 @@ class Vdigit: # Variable Base digits
         return out
 
 
+    def __getitem__(self, i):
+        "Returns the representation of the value `i` (without changing the value of this Vdigit)"
+        return str(Vdigit(self.bases, i))
+
+
     def revStr(self):
         """
         Returns the reversed string of the representation  
@@ -12,7 +12,7 @@ setup(
     author_email='matteo.benzi97@gmail.com',
     url='https://github.com/Bnz-0/logiq',
     license=LICENSE,
-    python_requires='>=3.6.0',
+    python_requires='>=3.7.0',
     packages=find_packages(exclude=('tests', 'docs', 'TODO')),
     install_requires=['numpy']
 )